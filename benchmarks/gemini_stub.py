@@ -0,0 +1,176 @@
+"""
+Local stand-in for the Gemini generateContent API.
+
+Answers POST .../models/<model>:generateContent and :streamGenerateContent
+with a canned JSON object chosen from the request's response schema, after a
+configurable delay. Counts requests and request bytes so the benchmark can
+report what each command sent.
+
+Run standalone:
+    python benchmarks/gemini_stub.py --port 8765 --latency 0.3
+    GITGUARD_GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=stub gitguard explain
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned answers keyed by the schema's property names (see gemini.py models)
+RESPONSES = {
+    frozenset({"risk", "summary", "commands", "missing_info_prompt", "explanation"}): {
+        "risk": "LOW",
+        "summary": "Show the working tree status.",
+        "commands": ["git status"],
+        "explanation": "git status lists staged, unstaged and untracked files."
+    },
+    frozenset({"subject", "body"}): {
+        "subject": "chore: update generated files",
+        "body": "- Regenerate synthetic benchmark content"
+    },
+    frozenset({"issues", "severity", "passed"}): {
+        "issues": [],
+        "severity": "LOW",
+        "passed": True
+    },
+    frozenset({"summary", "key_changes"}): {
+        "summary": "Several generated modules were edited.",
+        "key_changes": ["Updated generated values", "Added new lines"]
+    },
+    frozenset({"what_it_does", "use_cases", "risks", "related_commands"}): {
+        "what_it_does": "Shows the state of the working tree.",
+        "use_cases": ["Check what is staged"],
+        "risks": "None; it is read-only.",
+        "related_commands": ["git diff", "git log"]
+    },
+}
+
+# Chunks a streamed answer is split into
+STREAM_CHUNKS = 4
+
+
+def _schema_properties(body: dict) -> frozenset:
+    config = body.get("generationConfig") or body.get("generation_config") or {}
+    schema = config.get("responseSchema") or config.get("responseJsonSchema") or config.get("response_schema") or {}
+    return frozenset(schema.get("properties") or {})
+
+
+def _answer(body: dict) -> dict:
+    properties = _schema_properties(body)
+    if properties in RESPONSES:
+        return RESPONSES[properties]
+    for keys, answer in RESPONSES.items():
+        if keys <= properties or properties <= keys:
+            return answer
+    return {name: "stub" for name in properties}
+
+
+def _envelope(text: str, final: bool = True) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if final:
+        candidate["finishReason"] = "STOP"
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {"promptTokenCount": 1, "candidatesTokenCount": 1, "totalTokenCount": 2},
+        "modelVersion": "stub"
+    }
+
+
+class GeminiStub:
+    """Threaded HTTP server with request/byte counters; use as a context manager."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                with stub._lock:
+                    stub.requests += 1
+                    stub.bytes_received += len(raw) + len(self.requestline) + len(str(self.headers))
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    body = {}
+                if stub.latency:
+                    time.sleep(stub.latency)
+                text = json.dumps(_answer(body))
+                if ":streamGenerateContent" in self.path:
+                    self._stream(text)
+                else:
+                    self._send(200, json.dumps(_envelope(text)).encode(), "application/json")
+
+            def _send(self, status, payload, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, text):
+                size = max(1, -(-len(text) // STREAM_CHUNKS))
+                pieces = [text[i:i + size] for i in range(0, len(text), size)]
+                events = b"".join(
+                    b"data: " + json.dumps(_envelope(piece, final=i == len(pieces) - 1)).encode() + b"\r\n\r\n"
+                    for i, piece in enumerate(pieces)
+                )
+                self._send(200, events, "text/event-stream")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self):
+        """Zero the counters; returns (requests, bytes_received) before the reset."""
+        with self._lock:
+            counts = (self.requests, self.bytes_received)
+            self.requests = self.bytes_received = 0
+            return counts
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned Gemini responses locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    args = parser.parse_args()
+    stub = GeminiStub(args.host, args.port, args.latency)
+    print(f"Gemini stub listening on {stub.url} (latency {args.latency}s)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+End-to-end benchmarks for the gitguard CLI.
+
+Builds synthetic repositories (see synthrepo.py), starts a local Gemini stub
+(see gemini_stub.py) and runs each subcommand as a fresh process against a
+fresh copy of the repository, reporting:
+
+    wall      median wall-clock seconds
+    git       git processes started (counted by a `git` shim on PATH)
+    rss       peak resident memory of the gitguard process, MB
+    requests  HTTP requests the stub received
+    sent      bytes the command sent to the stub
+
+Results are compared against baseline.json; a regression exits with status 1.
+
+    python benchmarks/run.py                       # small scale, compare
+    python benchmarks/run.py --scale medium --latency 0.5
+    python benchmarks/run.py --update-baseline     # record new numbers
+
+Instead of the stub, Gemini answers can come from a cassette (see
+src/gitguard/cassette.py): record one against the real API once, then replay
+it offline with --latency as the simulated response time. Replayed requests
+never reach the stub, so requests/sent read 0.
+
+    GEMINI_API_KEY=... python benchmarks/run.py --real-api --cassette cassettes/ --cassette-mode record
+    python benchmarks/run.py --cassette cassettes/
+
+POSIX only (the shim is a shell script and peak RSS comes from wait4).
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), "src")
+sys.path.insert(0, SRC)
+
+from gemini_stub import GeminiStub  # noqa: E402
+from synthrepo import SCALES, describe, make_repo  # noqa: E402
+
+BASELINE_FILE = os.path.join(HERE, "baseline.json")
+
+# argv per benchmark; all are non-interactive (--yes) and exercise the AI path
+COMMANDS = {
+    "status": ["status"],
+    "run": ["--yes", "run", "show me what is going on"],
+    "commit": ["--yes", "commit"],
+    "audit": ["audit"],
+    "explain": ["explain"],
+    "clean": ["--yes", "clean"],
+    "rollback": ["--yes", "rollback"],
+}
+
+# A metric regresses when it exceeds baseline * (1 + tolerance) and the absolute slack
+ABSOLUTE_SLACK = {"wall": 0.05, "rss": 5.0, "sent": 512, "git": 0, "requests": 0}
+
+GIT_SHIM = """#!/bin/sh
+echo "$*" >> "$GITGUARD_BENCH_GIT_LOG"
+exec "{git}" "$@"
+"""
+
+
+def _make_shim(directory: str) -> str:
+    real_git = shutil.which("git")
+    if not real_git:
+        sys.exit("git not found on PATH")
+    bin_dir = os.path.join(directory, "bin")
+    os.makedirs(bin_dir)
+    shim = os.path.join(bin_dir, "git")
+    with open(shim, "w") as f:
+        f.write(GIT_SHIM.format(git=real_git))
+    os.chmod(shim, 0o755)
+    return bin_dir
+
+
+def _max_rss_mb(rusage) -> float:
+    # Linux reports kilobytes, macOS bytes
+    return rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_once(argv, repo: str, env: dict, git_log: str, stub: GeminiStub, output: str) -> dict:
+    """Run one gitguard command in repo and return its metrics."""
+    open(git_log, "w").close()
+    stub.reset()
+    cmd = [sys.executable, "-c", "from gitguard.client import main; main()"]
+    if output != "text":
+        cmd += ["--output", output]
+    with tempfile.TemporaryFile() as out:
+        started = time.perf_counter()
+        proc = subprocess.Popen(cmd + argv, cwd=repo, env=env, stdin=subprocess.DEVNULL, stdout=out, stderr=out)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - started
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode:
+            out.seek(0)
+            sys.stderr.write(out.read().decode(errors="replace"))
+            raise RuntimeError(f"gitguard {' '.join(argv)} exited with {proc.returncode}")
+    requests, sent = stub.reset()
+    with open(git_log) as f:
+        git_calls = sum(1 for _ in f)
+    return {"wall": wall, "git": git_calls, "rss": _max_rss_mb(rusage), "requests": requests, "sent": sent}
+
+
+def bench_scale(name: str, args, workdir: str) -> dict:
+    scale = SCALES[name]
+    template = os.path.join(workdir, f"template-{name}")
+    print(f"\n== {name}: {describe(scale)}")
+    started = time.perf_counter()
+    make_repo(template, scale, seed=args.seed)
+    print(f"   built repository in {time.perf_counter() - started:.1f}s")
+
+    bin_dir = _make_shim(os.path.join(workdir, f"shim-{name}"))
+    git_log = os.path.join(workdir, f"git-{name}.log")
+    results = {}
+    with GeminiStub(latency=args.latency) as stub:
+        env = {
+            **os.environ,
+            "PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""),
+            "PYTHONPATH": SRC + os.pathsep + os.environ.get("PYTHONPATH", ""),
+            "HOME": os.path.join(workdir, "home"),
+            "GITGUARD_NO_DAEMON": "1",
+            "GITGUARD_NO_FAST_PLAN": "1",
+            # Fail on any command that starts more git processes than its budget
+            "GITGUARD_GIT_STRICT": "1",
+            "GITGUARD_BENCH_GIT_LOG": git_log,
+        }
+        if not args.real_api:
+            env["GEMINI_API_KEY"] = "benchmark"
+            env["GITGUARD_GEMINI_BASE_URL"] = stub.url
+        if args.cassette:
+            env["GITGUARD_CASSETTE"] = os.path.abspath(args.cassette)
+            env["GITGUARD_CASSETTE_MODE"] = args.cassette_mode
+            env["GITGUARD_CASSETTE_LATENCY"] = str(args.latency)
+        if not args.cache:
+            env["GITGUARD_NO_CACHE"] = "1"
+        for command in args.commands:
+            runs = []
+            for n in range(args.repeat):
+                repo = os.path.join(workdir, f"{name}-{command}-{n}")
+                shutil.copytree(template, repo, symlinks=True)
+                try:
+                    runs.append(run_once(COMMANDS[command], repo, env, git_log, stub, args.output))
+                finally:
+                    shutil.rmtree(repo, ignore_errors=True)
+            results[command] = {
+                "wall": round(statistics.median(r["wall"] for r in runs), 3),
+                "git": max(r["git"] for r in runs),
+                "rss": round(max(r["rss"] for r in runs), 1),
+                "requests": max(r["requests"] for r in runs),
+                "sent": max(r["sent"] for r in runs),
+            }
+            m = results[command]
+            print(f"   {command:<9} wall {m['wall']:7.3f}s  git {m['git']:4d}  rss {m['rss']:6.1f}MB  "
+                  f"requests {m['requests']:3d}  sent {m['sent']:8d}B")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return human-readable regressions of results against baseline."""
+    regressions = []
+    for scale, commands in results.items():
+        for command, metrics in commands.items():
+            base = baseline.get("results", {}).get(scale, {}).get(command)
+            if not base:
+                continue
+            for metric, value in metrics.items():
+                if metric not in base:
+                    continue
+                limit = max(base[metric] * (1 + tolerance), base[metric] + ABSOLUTE_SLACK[metric])
+                if metric in ("git", "requests"):
+                    # Counts are deterministic; any increase is a regression
+                    limit = base[metric]
+                if value > limit:
+                    regressions.append(f"{scale}/{command}: {metric} {value} > baseline {base[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", action="append", choices=sorted(SCALES), help="Scale(s) to run (default: small)")
+    parser.add_argument("--commands", default=",".join(COMMANDS), help="Comma-separated subset of: " + ", ".join(COMMANDS))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per command; wall time is the median")
+    parser.add_argument("--latency", type=float, default=0.25, help="Seconds the Gemini stub waits before answering")
+    parser.add_argument("--output", default="text", choices=["text", "json", "ndjson"], help="gitguard --output mode to benchmark")
+    parser.add_argument("--cache", action="store_true", help="Leave the response cache enabled")
+    parser.add_argument("--cassette", metavar="DIR", help="Serve Gemini answers from (or record them to) a cassette directory")
+    parser.add_argument("--cassette-mode", default="replay", choices=["record", "replay", "auto"])
+    parser.add_argument("--real-api", action="store_true", help="Talk to the real Gemini API (needs GEMINI_API_KEY); use to record cassettes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative increase over the baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="Write results to the baseline file")
+    parser.add_argument("--json", metavar="PATH", help="Also write results to PATH")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated repositories")
+    args = parser.parse_args()
+    args.commands = [c.strip() for c in args.commands.split(",") if c.strip()]
+    unknown = set(args.commands) - set(COMMANDS)
+    if unknown:
+        parser.error(f"unknown command(s): {', '.join(sorted(unknown))}")
+    scales = args.scale or ["small"]
+
+    workdir = tempfile.mkdtemp(prefix="gitguard-bench-")
+    try:
+        results = {name: bench_scale(name, args, workdir) for name in scales}
+    finally:
+        if args.keep:
+            print(f"\nRepositories kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    settings = {"latency": args.latency, "output": args.output, "cache": args.cache}
+    if args.cassette and args.cassette_mode == "replay":
+        settings["source"] = "cassette"
+    elif args.real_api:
+        settings["source"] = "real-api"
+    report = {"settings": settings, "scales": {s: describe(SCALES[s]) for s in scales}, "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.setdefault("results", {}).update(results)
+        baseline.setdefault("scales", {}).update(report["scales"])
+        baseline["settings"] = settings
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline to compare against; run with --update-baseline to record one.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != settings:
+        print(f"\nNote: baseline was recorded with {baseline.get('settings')}, this run used {settings}.")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
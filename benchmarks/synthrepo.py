@@ -0,0 +1,158 @@
+"""
+Synthetic repositories for the benchmark suite.
+
+History is written with a single `git fast-import` stream, so even the large
+scale builds in seconds. Every repository ends with staged and unstaged edits
+(for commit/audit/explain) and GitGuard checkpoints created through the real
+snapshot/journal code (for status/clean/rollback).
+"""
+import os
+import random
+import subprocess
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+
+@dataclass(frozen=True)
+class Scale:
+    files: int
+    commits: int
+    branches: int
+    checkpoints: int
+    diff_files: int
+    diff_lines: int
+
+
+SCALES = {
+    "small": Scale(files=200, commits=50, branches=5, checkpoints=10, diff_files=5, diff_lines=20),
+    "medium": Scale(files=2000, commits=300, branches=30, checkpoints=100, diff_files=40, diff_lines=50),
+    "large": Scale(files=20000, commits=2000, branches=200, checkpoints=1000, diff_files=200, diff_lines=100),
+}
+
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "Bench",
+    "GIT_AUTHOR_EMAIL": "bench@localhost",
+    "GIT_COMMITTER_NAME": "Bench",
+    "GIT_COMMITTER_EMAIL": "bench@localhost",
+}
+
+LINES_PER_FILE = 40
+
+
+def _git(path, *args, input=None):
+    return subprocess.run(
+        ["git", *args],
+        cwd=path,
+        input=input,
+        capture_output=True,
+        check=True,
+        env={**os.environ, **IDENTITY}
+    ).stdout.decode().strip()
+
+
+def _file_path(i: int) -> str:
+    return f"pkg{i % 50:02d}/mod{i:05d}.py"
+
+
+def _file_body(i: int, revision: int, lines: int = LINES_PER_FILE) -> str:
+    return "".join(f"VALUE_{i}_{n} = {revision * 1000 + n}\n" for n in range(lines))
+
+
+def _fast_import_stream(scale: Scale, rng: random.Random) -> bytes:
+    out = []
+    epoch = 1700000000
+
+    def blob(text: str):
+        data = text.encode()
+        out.append(b"data %d\n" % len(data) + data + b"\n")
+
+    for c in range(scale.commits):
+        message = f"commit {c}"
+        out.append(b"commit refs/heads/main\n")
+        out.append(b"mark :%d\n" % (c + 1))
+        out.append(f"committer Bench <bench@localhost> {epoch + c * 60} +0000\n".encode())
+        blob(message)
+        if c:
+            out.append(b"from :%d\n" % c)
+        # The first commit adds every file; later ones touch a few
+        touched = range(scale.files) if c == 0 else rng.sample(range(scale.files), min(3, scale.files))
+        for i in touched:
+            out.append(f"M 100644 inline {_file_path(i)}\n".encode())
+            blob(_file_body(i, c))
+    return b"".join(out)
+
+
+def make_repo(path: str, scale: Scale, seed: int = 0):
+    """
+    Create a repository at path for the given scale.
+
+    Args:
+        path: Empty or missing directory
+        scale: Sizes to generate
+        seed: Seed for which files later commits and the final diff touch
+    """
+    rng = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    _git(path, "init", "-q", "-b", "main")
+    _git(path, "config", "user.name", IDENTITY["GIT_AUTHOR_NAME"])
+    _git(path, "config", "user.email", IDENTITY["GIT_AUTHOR_EMAIL"])
+    _git(path, "fast-import", "--quiet", input=_fast_import_stream(scale, rng))
+    _git(path, "checkout", "-q", "-f", "main")
+
+    # Branches at points spread over history
+    if scale.branches:
+        refs = "".join(
+            f"create refs/heads/feature-{b:04d} main~{b * scale.commits // (scale.branches + 1)}\n"
+            for b in range(scale.branches)
+        )
+        _git(path, "update-ref", "--stdin", input=refs.encode())
+
+    # Pending work: half staged, half unstaged, plus one untracked file
+    changed = rng.sample(range(scale.files), min(scale.diff_files, scale.files))
+    for n, i in enumerate(changed):
+        with open(os.path.join(path, _file_path(i)), "a") as f:
+            f.write(_file_body(i, scale.commits + 1, scale.diff_lines))
+        if n % 2 == 0:
+            _git(path, "add", _file_path(i))
+    with open(os.path.join(path, "NOTES.txt"), "w") as f:
+        f.write("untracked\n")
+
+    _add_checkpoints(path, scale.checkpoints)
+
+
+def _add_checkpoints(path: str, count: int):
+    """Register count checkpoints sharing one real snapshot of the current state."""
+    if not count:
+        return
+    from gitguard.git_ops import CHECKPOINT_REF_PREFIX
+    from gitguard.journal import CheckpointJournal
+    from gitguard.snapshot import take_snapshot
+
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        head = _git(".", "rev-parse", "HEAD")
+        snapshot = take_snapshot(head, label="benchmark")
+        newest = datetime(2025, 1, 1, 12, 0, 0)
+        entries = []
+        for n in range(count):
+            cp_id = (newest - timedelta(minutes=n)).strftime("%Y%m%d_%H%M%S")
+            entries.append({
+                "id": cp_id,
+                "ref": CHECKPOINT_REF_PREFIX + cp_id,
+                "created": cp_id,
+                "head": snapshot["head"],
+                "index_tree": snapshot["index_tree"],
+                "worktree_tree": snapshot["worktree_tree"],
+            })
+        _git(".", "update-ref", "--stdin",
+             input="".join(f"create {cp['ref']} {snapshot['commit']}\n" for cp in entries).encode())
+        journal = CheckpointJournal()
+        with journal.lock():
+            journal.compact(entries)
+    finally:
+        os.chdir(cwd)
+
+
+def describe(scale: Scale) -> dict:
+    return asdict(scale)
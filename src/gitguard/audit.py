@@ -0,0 +1,161 @@
+import subprocess
+from collections import namedtuple
+import logging
+
+from . import gitexec
+from .cache import CACHE_TTLS, audit_cache, cache_enabled, make_key
+from .diffpack import iter_file_diffs, chunk_files
+from .lazy import lazy_import
+from .scanner import RULES_VERSION, findings_to_result, redact, scan_file
+
+gemini = lazy_import(f"{__package__}.gemini")
+
+logger = logging.getLogger(__name__)
+
+# Paths per `git diff` invocation when only some files need re-auditing
+PATHSPEC_BATCH = 500
+
+StagedChange = namedtuple("StagedChange", "path old_path status old_oid new_oid")
+
+def staged_changes():
+    """
+    List staged files with their pre- and post-image blob ids.
+
+    Uses `git diff --cached --raw`, which reads no file content, so it is cheap
+    enough to run before deciding which files actually need auditing.
+    """
+    try:
+        output = gitexec.run(["diff", "--cached", "--raw", "-z", "--no-abbrev", "-M"]).stdout
+    except (subprocess.SubprocessError, OSError):
+        return []
+    fields = output.decode("utf-8", "surrogateescape").split("\0")
+    changes = []
+    i = 0
+    while i < len(fields) and fields[i].startswith(":"):
+        _, _, old_oid, new_oid, status = fields[i][1:].split(" ")
+        if status[0] in "RC":
+            old_path, path = fields[i + 1], fields[i + 2]
+            i += 3
+        else:
+            old_path, path = None, fields[i + 1]
+            i += 2
+        changes.append(StagedChange(path, old_path, status[0], old_oid, new_oid))
+    return changes
+
+def _file_key(change, *extra) -> str:
+    return make_key("audit-file", RULES_VERSION, change.path, change.old_path,
+                    change.old_oid, change.new_oid, *extra)
+
+def _stream_diffs(changes, everything: bool):
+    if everything:
+        yield from iter_file_diffs(["--cached"])
+        return
+    paths = []
+    for change in changes:
+        paths.append(change.path)
+        if change.old_path:
+            paths.append(change.old_path)
+    for start in range(0, len(paths), PATHSPEC_BATCH):
+        batch = [f":(literal){p}" for p in paths[start:start + PATHSPEC_BATCH]]
+        yield from iter_file_diffs(["--cached", "--", *batch])
+
+def run_audit(changes, local_only: bool = False, concurrency: int = None):
+    """
+    Audit staged changes, re-using per-file results from earlier runs.
+
+    Scanner findings and AI verdicts are cached per (path, pre-image blob,
+    post-image blob) under .git/gitguard/audit; the keys also carry the scanner
+    rules version and, for AI verdicts, the model name. Only files without a
+    cached result are diffed, scanned and sent to the AI.
+
+    Returns:
+        (result, stats): an AuditResult-compatible dict and counts of
+        cached/audited files. stats["ai_unavailable"] is set when the AI could
+        not audit anything, in which case result holds the local scan only.
+    """
+    cache = audit_cache() if cache_enabled() else None
+    ttl = CACHE_TTLS["audit"]
+    model = None if local_only else gemini.MODEL
+
+    findings = {}
+    ai_results = {}
+    pending = []
+    for change in changes:
+        cached_findings = cache.get(_file_key(change, "scan"), ttl) if cache else None
+        cached_ai = None
+        if cache and not local_only:
+            cached_ai = cache.get(_file_key(change, "ai", model), ttl)
+        if cached_findings is not None:
+            findings[change.path] = cached_findings
+        if cached_ai is not None:
+            ai_results[change.path] = cached_ai
+        if cached_findings is None or (not local_only and cached_ai is None):
+            pending.append(change)
+
+    by_path = {change.path: change for change in pending}
+    chunk_owners = []
+    chunks = []
+    incomplete = []
+    for file_diff in _stream_diffs(pending, everything=len(pending) == len(changes)):
+        change = by_path.get(file_diff.path)
+        if change is not None and change.path in findings and (local_only or change.path in ai_results):
+            continue
+        if file_diff.path not in findings:
+            file_findings = scan_file(file_diff)
+            findings[file_diff.path] = file_findings
+            if cache and change is not None:
+                cache.put(_file_key(change, "scan"), file_findings)
+        if local_only or file_diff.path in ai_results:
+            continue
+        file_chunks = [redact(c) for c in chunk_files([file_diff], incomplete=incomplete)]
+        if not file_chunks:
+            # Nothing auditable (binary, lockfile, pure rename): a clean verdict for
+            # this run only. It is not cached, since the AI never saw the content and
+            # a later change to what is skipped must not find a stored "clean" answer.
+            ai_results[file_diff.path] = {"issues": [], "severity": "LOW", "passed": True}
+            continue
+        for chunk in file_chunks:
+            chunk_owners.append(file_diff.path)
+            chunks.append(chunk)
+
+    stats = {
+        "files": len(changes),
+        "cached": len(changes) - len(pending),
+        "audited": len(pending),
+        "chunks": len(chunks),
+        "ai_unavailable": False,
+    }
+    logger.info(f"Audit: {stats}")
+
+    scan_result = findings_to_result([f for path in findings for f in findings[path]])
+    if local_only:
+        return scan_result, stats
+
+    failed = 0
+    if chunks:
+        outcomes = gemini.audit_each(chunks, concurrency, prescanned=True)
+        per_file = {}
+        for path, outcome in zip(chunk_owners, outcomes):
+            per_file.setdefault(path, []).append(outcome)
+        for path, file_outcomes in per_file.items():
+            if not all(isinstance(o, dict) for o in file_outcomes):
+                failed += 1
+                continue
+            ai_results[path] = gemini.merge_audit_results(file_outcomes)
+            change = by_path.get(path)
+            if cache and change is not None:
+                cache.put(_file_key(change, "ai", model), ai_results[path])
+
+    if not ai_results:
+        stats["ai_unavailable"] = True
+        return scan_result, stats
+    result = gemini.merge_audit_results([scan_result, *ai_results.values()])
+    result["findings"] = scan_result["findings"]
+    if incomplete:
+        result["issues"].append(f"Only part of {len(incomplete)} file(s) was audited by the AI: {', '.join(incomplete[:10])}")
+    if failed:
+        result["issues"].append(f"{failed} file(s) could not be audited by the AI")
+        result["passed"] = False
+        if result["severity"] == "LOW":
+            result["severity"] = "MEDIUM"
+    return result, stats
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import pathlib
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached response stays valid, per call type
+CACHE_TTLS = {
+    "plan": 60 * 60,
+    "commit": 24 * 60 * 60,
+    "audit": 7 * 24 * 60 * 60,
+    "explain": 24 * 60 * 60,
+    "learn": 30 * 24 * 60 * 60,
+}
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+# Rescan the directory after this many writes even if the size estimate is
+# under the limit, to pick up entries other processes wrote
+RESCAN_EVERY = 256
+
+# Estimated bytes on disk per cache directory and writes since the last scan,
+# shared by every ResponseCache on the same root in this process
+_sizes = {}
+
+def cache_enabled() -> bool:
+    return not os.getenv("GITGUARD_NO_CACHE")
+
+def make_key(*parts) -> str:
+    """Hash arbitrary JSON-serialisable parts into a stable cache key."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Content-addressed JSON store with TTLs and size-bounded LRU eviction.
+
+    Each entry is one file named after its key. A hit bumps the file's mtime,
+    so eviction can drop the least recently used entries first once the
+    directory grows past max_bytes. The directory size is scanned once and
+    then tracked per write, so a put does not stat every entry.
+    """
+
+    def __init__(self, root, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = pathlib.Path(root)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str, ttl: int = None):
+        """Return the cached value for key, or None if missing, expired or unreadable."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if ttl is not None and time.time() - entry.get("created", 0) > ttl:
+            self._unlink(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("value")
+
+    def put(self, key: str, value):
+        path = self._path(key)
+        try:
+            old_size = path.stat().st_size
+        except OSError:
+            old_size = 0
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump({"created": time.time(), "value": value}, f)
+                written = f.tell()
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {key}: {e}")
+            return
+        state = _sizes.get(self.root.absolute())
+        if state is None:
+            self._evict()
+            return
+        state["bytes"] += written - old_size
+        state["writes"] += 1
+        if state["bytes"] > self.max_bytes or state["writes"] >= RESCAN_EVERY:
+            self._evict()
+
+    def _unlink(self, path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for path in self.root.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._unlink(path)
+                total -= size
+                logger.info(f"Evicted cache entry: {path.name}")
+        # Keyed on the absolute path: the daemon serves many repositories from one process
+        _sizes[self.root.absolute()] = {"bytes": total, "writes": 0}
+
+def _max_bytes() -> int:
+    try:
+        return int(os.getenv("GITGUARD_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+    except ValueError:
+        return DEFAULT_MAX_BYTES
+
+def repo_cache() -> ResponseCache:
+    """Cache for responses that depend on this repository's state."""
+    return ResponseCache(pathlib.Path('.git') / 'gitguard' / 'cache', _max_bytes())
+
+def global_cache() -> ResponseCache:
+    """Cache for responses that do not depend on any repository."""
+    return ResponseCache(pathlib.Path.home() / '.gitguard' / 'cache', _max_bytes())
+
+def audit_cache() -> ResponseCache:
+    """Per-file audit findings, keyed on path and blob ids."""
+    return ResponseCache(pathlib.Path('.git') / 'gitguard' / 'audit', _max_bytes())
+
+# Call types whose answers do not depend on the current repository
+GLOBAL_KINDS = {"learn"}
+
+def cache_for(kind: str):
+    """Return the cache that responses of this call type live in, or None if uncached."""
+    if kind not in CACHE_TTLS or not cache_enabled():
+        return None
+    return global_cache() if kind in GLOBAL_KINDS else repo_cache()
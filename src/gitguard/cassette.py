@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODES = ("record", "replay", "auto")
+
+# Response headers worth keeping; the rest (dates, server ids) only add churn
+KEPT_HEADERS = ("content-type",)
+# Describe the encoded body, which is gone once the response has been read
+ENCODING_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+class CassetteMiss(Exception):
+    """Replay mode found no recording for a request."""
+
+def settings():
+    """
+    Cassette configuration from the environment, or None when disabled.
+
+    GITGUARD_CASSETTE: directory holding one JSON file per request
+    GITGUARD_CASSETTE_MODE: record (always call the API and store the answer),
+        replay (serve only from disk; a miss is an error) or auto (replay when
+        recorded, else record); default auto
+    GITGUARD_CASSETTE_LATENCY: seconds to wait before serving a replayed answer
+
+    Returns:
+        (directory, mode, latency) or None
+    """
+    directory = os.getenv("GITGUARD_CASSETTE")
+    if not directory:
+        return None
+    mode = os.getenv("GITGUARD_CASSETTE_MODE", "auto").lower()
+    if mode not in MODES:
+        logger.warning(f"Unknown GITGUARD_CASSETTE_MODE {mode!r}; using auto")
+        mode = "auto"
+    try:
+        latency = float(os.getenv("GITGUARD_CASSETTE_LATENCY", "0"))
+    except ValueError:
+        latency = 0.0
+    return (os.path.abspath(os.path.expanduser(directory)), mode, latency)
+
+def replay_only() -> bool:
+    """True when no real API call can happen, so no API key is needed."""
+    config = settings()
+    return config is not None and config[1] == "replay"
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """
+    Hash what identifies a request: method, URL path and the JSON body.
+
+    The host, query string (which may carry the API key) and headers are left
+    out, so a recording made against the real endpoint replays against a stub
+    URL and vice versa. JSON bodies are re-serialised with sorted keys.
+    """
+    try:
+        canonical = json.dumps(json.loads(body or b"null"), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        canonical = body or b""
+    digest = hashlib.sha256()
+    for part in (method.upper().encode(), path.encode(), canonical):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def make_transport(inner, config):
+    """Wrap an httpx transport with record/replay for the given settings() tuple."""
+    import httpx
+
+    directory, mode, latency = config
+
+    class CassetteTransport(httpx.BaseTransport):
+        """
+        httpx transport that records responses to, or replays them from, disk.
+
+        Entries are written atomically (temp file + rename), so concurrent
+        recorders never leave a half-written file behind.
+        """
+
+        def __init__(self):
+            self.inner = inner
+            self.root = pathlib.Path(directory)
+            self._lock = threading.Lock()
+
+        def _path(self, key: str) -> pathlib.Path:
+            return self.root / f"{key}.json"
+
+        def handle_request(self, request):
+            body = request.read()
+            key = request_key(request.method, request.url.path, body)
+            path = self._path(key)
+            if mode in ("replay", "auto") and path.exists():
+                return self._replay(request, path)
+            if mode == "replay":
+                raise CassetteMiss(f"No recording for {request.method} {request.url.path} ({path})")
+            return self._record(request, body, path)
+
+        def _replay(self, request, path):
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            if latency:
+                time.sleep(latency)
+            logger.info(f"Replayed {request.method} {request.url.path} from {path.name}")
+            saved = entry["response"]
+            return httpx.Response(
+                saved["status"],
+                headers=saved.get("headers") or {},
+                content=saved["body"].encode("utf-8"),
+                request=request
+            )
+
+        def _record(self, request, body, path):
+            response = self.inner.handle_request(request)
+            content = response.read()
+            response.close()
+            entry = {
+                "request": {
+                    "method": request.method,
+                    "path": request.url.path,
+                    "body": _decode_json(body),
+                },
+                "response": {
+                    "status": response.status_code,
+                    "headers": {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+                    "body": content.decode("utf-8", "replace"),
+                },
+            }
+            if response.status_code < 400:
+                with self._lock:
+                    self.root.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                    tmp.write_text(json.dumps(entry, indent=2), encoding="utf-8")
+                    os.replace(tmp, path)
+                logger.info(f"Recorded {request.method} {request.url.path} to {path.name}")
+            return httpx.Response(
+                response.status_code,
+                headers=[(k, v) for k, v in response.headers.multi_items() if k.lower() not in ENCODING_HEADERS],
+                content=content,
+                request=request,
+                extensions=response.extensions
+            )
+
+        def close(self):
+            self.inner.close()
+
+    return CassetteTransport()
+
+def _decode_json(body: bytes):
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        return body.decode("utf-8", "replace")
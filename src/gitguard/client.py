@@ -0,0 +1,97 @@
+import os
+import socket
+import sys
+
+from . import daemon
+
+# Subcommands that must not be forwarded (they manage the daemon itself)
+LOCAL_COMMANDS = {"daemon"}
+
+# Exit status when the daemon went away while running a command
+LOST_EXIT = 75
+# Exit status after Ctrl-C, as for any process killed by SIGINT
+INTERRUPTED_EXIT = 130
+# Seconds to wait for the daemon to abandon a cancelled command
+CANCEL_TIMEOUT = 5.0
+
+def _forward(argv):
+    """
+    Run argv inside the daemon.
+
+    Falling back to an in-process run is only safe while the daemon cannot
+    have started the command: before the request is delivered, or when it
+    answers busy/stopping. Once it may be running, a lost connection is
+    reported and never retried, since plans can mutate the repository.
+
+    Ctrl-C is forwarded as a `cancel` message, and the client waits for the
+    daemon to abandon the command before exiting, so the daemon is no longer
+    reading the terminal by the time the shell gets it back.
+
+    Returns:
+        The exit code, or None if the daemon is not running, busy or stopping
+    """
+    if os.getenv("GITGUARD_NO_DAEMON") or not daemon.supported() or not daemon.SOCKET_PATH.exists():
+        return None
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(1.0)
+        sock.connect(str(daemon.SOCKET_PATH))
+    except OSError:
+        return None
+    with sock:
+        try:
+            daemon.send_message(sock, {
+                "op": "run",
+                "argv": argv,
+                "cwd": os.getcwd(),
+                "env": dict(os.environ),
+                "encoding": sys.stdout.encoding,
+            }, fds=[0, 1, 2])
+        except (OSError, ConnectionError):
+            return None
+        try:
+            # Commands can wait on prompts or the AI for a long time
+            sock.settimeout(None)
+            reply, _ = daemon.recv_message(sock)
+        except KeyboardInterrupt:
+            _cancel(sock)
+            return INTERRUPTED_EXIT
+        except (OSError, ValueError, ConnectionError) as e:
+            sys.stderr.write(
+                f"gitguard: lost connection to the daemon while it was running the command ({e}).\n"
+                "It may have run partly or fully; check `git status` and `gitguard rollback --list` before retrying.\n"
+            )
+            return LOST_EXIT
+    if reply.get("status") != "done":
+        return None
+    if reply.get("stopping"):
+        sys.stderr.write("gitguard: the daemon has stopped; later commands run without it.\n")
+    return reply.get("exit", 0)
+
+def _cancel(sock):
+    """Ask the daemon to interrupt the forwarded command and wait until it has."""
+    try:
+        sock.settimeout(CANCEL_TIMEOUT)
+        daemon.send_message(sock, {"op": "cancel"})
+        daemon.recv_message(sock)
+    except (OSError, ValueError, ConnectionError, KeyboardInterrupt):
+        # Closing the socket cancels the command too
+        pass
+
+def main():
+    """
+    `gitguard` entry point: forward to a running daemon, else run in-process.
+
+    Nothing heavier than the socket module is imported on the forwarding
+    path; the CLI (typer, rich, genai) is only imported when falling back.
+    """
+    argv = sys.argv[1:]
+    if not (argv and argv[0] in LOCAL_COMMANDS):
+        code = _forward(argv)
+        if code is not None:
+            sys.exit(code)
+    from .main import app
+    app()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import io
+import json
+import os
+import pathlib
+import queue
+import select
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = pathlib.Path.home() / '.gitguard'
+SOCKET_PATH = STATE_DIR / 'daemon.sock'
+PID_FILE = STATE_DIR / 'daemon.pid'
+
+# Exit after this many seconds without a request
+IDLE_TIMEOUT = 30 * 60
+# Seconds `daemon start` waits for the socket to appear
+START_TIMEOUT = 10.0
+
+_HEADER = struct.Struct("!I")
+
+def supported() -> bool:
+    """The daemon needs Unix sockets with fd passing (not available on Windows)."""
+    return hasattr(socket, "AF_UNIX") and hasattr(socket, "send_fds")
+
+def send_message(sock, payload: dict, fds=()):
+    data = json.dumps(payload).encode("utf-8")
+    if fds:
+        socket.send_fds(sock, [_HEADER.pack(len(data))], list(fds))
+    else:
+        sock.sendall(_HEADER.pack(len(data)))
+    sock.sendall(data)
+
+def _recv_exact(sock, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def recv_message(sock, max_fds: int = 0):
+    """
+    Read one length-prefixed JSON message.
+
+    Returns:
+        (payload, fds) where fds are any file descriptors sent with it
+    """
+    if max_fds:
+        header, fds, _, _ = socket.recv_fds(sock, _HEADER.size, max_fds)
+        if len(header) < _HEADER.size:
+            header += _recv_exact(sock, _HEADER.size - len(header))
+    else:
+        header, fds = _recv_exact(sock, _HEADER.size), []
+    (size,) = _HEADER.unpack(header)
+    return json.loads(_recv_exact(sock, size)), fds
+
+def request(payload: dict, timeout: float = 2.0):
+    """Send a control request (ping/stop) and return the reply, or None if no daemon answers."""
+    if not supported() or not SOCKET_PATH.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(SOCKET_PATH))
+            send_message(sock, payload)
+            reply, _ = recv_message(sock)
+            return reply
+    except (OSError, ValueError, ConnectionError):
+        return None
+
+def start() -> bool:
+    """Start the daemon in the background; returns True once it answers pings."""
+    if request({"op": "ping"}):
+        return True
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    subprocess.Popen(
+        [sys.executable, "-c", f"from {__package__}.daemon import serve; serve()"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        close_fds=True
+    )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if request({"op": "ping"}, timeout=0.5):
+            return True
+        time.sleep(0.1)
+    return False
+
+class _Daemon:
+    """
+    Serves forwarded CLI invocations one at a time inside a warm process.
+
+    A request borrows the client's stdin/stdout/stderr (passed as file
+    descriptors), cwd and environment for the duration of one typer app run,
+    so output, prompts and exit codes behave exactly as in-process. Only one
+    request runs at a time because cwd, environ and fds 0-2 are process-wide;
+    concurrent clients are told the daemon is busy and run in-process instead.
+
+    Connections are accepted on a background thread and commands run on the
+    main thread, so a cancel (the client's `cancel` message on Ctrl-C, or its
+    socket closing) can interrupt the command with SIGINT exactly as Ctrl-C
+    would in-process, before the client hands the terminal back to the shell.
+
+    Stopping (the `stop` op or the idle timeout) refuses new runs and then
+    waits for the running command to finish, so it is never torn down with
+    the interpreter while it still holds the client's fds.
+    """
+
+    def __init__(self):
+        self._busy = threading.Lock()
+        self._stop = threading.Event()
+        self._last_request = time.monotonic()
+        self._handlers = []
+        self._jobs = queue.Queue()
+        # Guards each job's "started"/"cancelled" hand-off between its handler and the main thread
+        self._job_lock = threading.Lock()
+        # Only true while a command is inside the typer app; SIGINT is ignored otherwise
+        self._interruptible = False
+        # Import the CLI (and with it gemini, git workers, caches) once, up front
+        from . import main as cli
+        self._cli = cli
+        from dotenv import dotenv_values, find_dotenv
+        self._dotenv = {k: v for k, v in dotenv_values(find_dotenv()).items() if v is not None}
+
+    def serve(self):
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        if SOCKET_PATH.exists():
+            if request({"op": "ping"}):
+                logger.info("Daemon already running")
+                return
+            SOCKET_PATH.unlink()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            server.bind(str(SOCKET_PATH))
+        finally:
+            os.umask(old_umask)
+        server.listen(16)
+        server.settimeout(1.0)
+        PID_FILE.write_text(str(os.getpid()))
+        logger.info(f"Daemon listening on {SOCKET_PATH} (pid {os.getpid()})")
+        signal.signal(signal.SIGINT, self._on_sigint)
+        acceptor = threading.Thread(target=self._accept, args=(server,), daemon=True)
+        acceptor.start()
+        try:
+            while not self._stop.is_set():
+                if time.monotonic() - self._last_request > IDLE_TIMEOUT and not self._busy.locked():
+                    logger.info("Daemon idle timeout")
+                    break
+                try:
+                    job = self._jobs.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                self._execute(job)
+        finally:
+            self._stop.set()
+            acceptor.join()
+            server.close()
+            for handler in self._handlers:
+                if handler.is_alive():
+                    logger.info("Daemon stopping; waiting for handlers to finish")
+                handler.join()
+            for path in (SOCKET_PATH, PID_FILE):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _accept(self, server):
+        while not self._stop.is_set():
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self._handlers = [t for t in self._handlers if t.is_alive()]
+            handler = threading.Thread(target=self._handle, args=(conn,), daemon=True)
+            handler.start()
+            self._handlers.append(handler)
+
+    def _on_sigint(self, signum, frame):
+        if self._interruptible:
+            raise KeyboardInterrupt
+
+    def _execute(self, job):
+        with self._job_lock:
+            if job["cancelled"]:
+                job["done"].set()
+                return
+            job["started"] = True
+        try:
+            job["exit"] = self._run(job["message"], job["fds"])
+        finally:
+            job["done"].set()
+
+    def _handle(self, conn):
+        with conn:
+            fds = []
+            try:
+                message, fds = recv_message(conn, max_fds=3)
+                op = message.get("op")
+                if op == "ping":
+                    send_message(conn, {"status": "ok", "pid": os.getpid()})
+                elif op == "stop":
+                    self._stop.set()
+                    send_message(conn, {"status": "ok", "busy": self._busy.locked()})
+                elif op == "run":
+                    if self._stop.is_set():
+                        # Not started, so the client can safely run it in-process
+                        send_message(conn, {"status": "stopping"})
+                        return
+                    if len(fds) != 3 or not self._busy.acquire(blocking=False):
+                        send_message(conn, {"status": "busy"})
+                        return
+                    job = {"message": message, "fds": fds, "done": threading.Event(),
+                           "started": False, "cancelled": False, "exit": 1}
+                    try:
+                        self._last_request = time.monotonic()
+                        self._jobs.put(job)
+                        self._watch(conn, job)
+                    finally:
+                        self._last_request = time.monotonic()
+                        self._busy.release()
+                    if not job["started"]:
+                        send_message(conn, {"status": "stopping"})
+                        return
+                    send_message(conn, {"status": "done", "exit": job["exit"], "stopping": self._stop.is_set()})
+                else:
+                    send_message(conn, {"status": "error", "error": f"unknown op {op!r}"})
+            except Exception as e:
+                logger.error(f"Daemon request failed: {e}")
+            finally:
+                for fd in fds:
+                    os.close(fd)
+
+    def _watch(self, conn, job):
+        """
+        Wait for a job to finish, interrupting it if the client cancels.
+
+        A `cancel` message or the connection closing (the client was killed)
+        both mean nobody is waiting for the command any more.
+        """
+        while not job["done"].wait(0.1):
+            if self._stop.is_set():
+                with self._job_lock:
+                    if not job["started"]:
+                        # The main loop has stopped taking jobs; this one never ran
+                        job["cancelled"] = True
+                        return
+            if job["cancelled"] or not select.select([conn], [], [], 0)[0]:
+                continue
+            try:
+                message, _ = recv_message(conn)
+            except (OSError, ValueError, ConnectionError):
+                message = None
+            if message is None or message.get("op") == "cancel":
+                logger.info("Client cancelled the running command")
+                with self._job_lock:
+                    job["cancelled"] = True
+                    if job["started"]:
+                        signal.pthread_kill(threading.main_thread().ident, signal.SIGINT)
+
+    def _run(self, message, fds) -> int:
+        from .git_worker import invalidate_workers
+        from .planner import flush_stats
+        from .ui import reset_console
+
+        saved_fds = [os.dup(n) for n in range(3)]
+        saved_streams = (sys.stdin, sys.stdout, sys.stderr)
+        saved_cwd = os.getcwd()
+        saved_env = dict(os.environ)
+        code = 0
+        try:
+            for n, fd in enumerate(fds):
+                os.dup2(fd, n)
+            # Fresh text streams so no buffered input or output leaks between clients
+            sys.stdin = io.TextIOWrapper(open(0, "rb", closefd=False), encoding=message.get("encoding"))
+            sys.stdout = io.TextIOWrapper(open(1, "wb", closefd=False), encoding=message.get("encoding"), line_buffering=True)
+            sys.stderr = io.TextIOWrapper(open(2, "wb", closefd=False), encoding=message.get("encoding"), line_buffering=True)
+            os.environ.clear()
+            os.environ.update({**self._dotenv, **message.get("env", {})})
+            os.chdir(message["cwd"])
+            reset_console()
+            # The repo may have changed since the last request
+            invalidate_workers()
+
+            logger.info(f"Daemon running: gitguard {' '.join(message.get('argv', []))}")
+            try:
+                self._interruptible = True
+                self._cli.app(args=message.get("argv", []), prog_name="gitguard")
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except KeyboardInterrupt:
+                code = 130
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            finally:
+                self._interruptible = False
+        finally:
+            for stream in (sys.stdout, sys.stderr):
+                try:
+                    stream.flush()
+                except (OSError, ValueError):
+                    pass
+            sys.stdin, sys.stdout, sys.stderr = saved_streams
+            for n, fd in enumerate(saved_fds):
+                os.dup2(fd, n)
+                os.close(fd)
+            os.environ.clear()
+            os.environ.update(saved_env)
+            os.chdir(saved_cwd)
+            reset_console()
+            flush_stats()
+        return code
+
+def serve():
+    """Run the daemon in the foreground until stopped or idle."""
+    _Daemon().serve()
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,345 @@
+import os
+import re
+import subprocess
+import logging
+
+from . import gitexec
+
+logger = logging.getLogger(__name__)
+
+# Rough conversion used to turn a token budget into characters of diff
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 3000
+# pack_diff keeps hunks for up to this many times its budget across all files,
+# enough to choose what to pack; later files keep only their stat counts
+RETAIN_BUDGET_FACTOR = 4
+
+LOCKFILES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml",
+    "poetry.lock", "uv.lock", "Pipfile.lock", "Cargo.lock", "Gemfile.lock",
+    "composer.lock", "go.sum", "flake.lock", "mix.lock", "pubspec.lock",
+}
+GENERATED_RE = re.compile(
+    r"(\.min\.(js|css)$|\.map$|_pb2(_grpc)?\.pyi?$|\.pb\.go$|\.g\.dart$|\.snap$"
+    r"|(^|/)(dist|build|vendor|node_modules|__generated__)/)"
+)
+TEST_RE = re.compile(r"((^|/)(tests?|__tests__|spec)/|(^|/)test_[^/]+$|(_test|\.test|\.spec|_spec)\.[^/]+$)")
+DOC_RE = re.compile(r"\.(md|rst|txt|adoc)$|(^|/)(docs?|CHANGELOG[^/]*|LICENSE[^/]*)(/|$)", re.IGNORECASE)
+CONFIG_RE = re.compile(r"\.(json|ya?ml|toml|ini|cfg|lock|xml)$|(^|/)\.[^/]+$")
+
+class FileDiff:
+    """One file's section of a unified diff, with hunks kept up to a size cap."""
+
+    def __init__(self, header_line: str):
+        self.path = _path_from_header(header_line)
+        self.old_path = None
+        self.status = "M"
+        self.old_oid = None
+        self.new_oid = None
+        self.header = [header_line]
+        self.hunks = []
+        self.added = 0
+        self.removed = 0
+        self.binary = False
+        self.truncated = False
+        self.size = len(header_line)
+
+    @property
+    def skip_reason(self):
+        """Why this file's content should not be sent to the model, or None."""
+        if self.binary:
+            return "binary"
+        if os.path.basename(self.path) in LOCKFILES:
+            return "lockfile"
+        if GENERATED_RE.search(self.path):
+            return "generated"
+        return None
+
+    @property
+    def priority(self) -> int:
+        """Lower is more interesting: source, then tests, then config, then docs."""
+        if TEST_RE.search(self.path):
+            return 1
+        if CONFIG_RE.search(self.path):
+            return 2
+        if DOC_RE.search(self.path):
+            return 3
+        return 0
+
+    @property
+    def header_text(self) -> str:
+        return "".join(self.header)
+
+    def text(self, hunks=None) -> str:
+        return self.header_text + "".join(self.hunks if hunks is None else hunks)
+
+    def stat_line(self) -> str:
+        name = f"{self.old_path} => {self.path}" if self.old_path else self.path
+        counts = "" if self.binary else f" (+{self.added} -{self.removed})"
+        return f"  {self.status} {name}{counts}"
+
+    def _parse_header(self, line: str):
+        if line.startswith("index "):
+            # Full blob ids are kept for cache keys but are noise to the model
+            oids = line.split()[1]
+            self.old_oid, _, self.new_oid = oids.partition("..")
+            return
+        self.header.append(line)
+        self.size += len(line)
+        if line.startswith("new file mode"):
+            self.status = "A"
+        elif line.startswith("deleted file mode"):
+            self.status = "D"
+        elif line.startswith("rename from "):
+            self.status = "R"
+            self.old_path = line[len("rename from "):].rstrip("\n")
+        elif line.startswith("rename to "):
+            self.path = line[len("rename to "):].rstrip("\n")
+        elif line.startswith("copy from "):
+            self.status = "C"
+            self.old_path = line[len("copy from "):].rstrip("\n")
+        elif line.startswith("copy to "):
+            self.path = line[len("copy to "):].rstrip("\n")
+        elif line.startswith("Binary files ") or line.startswith("GIT binary patch"):
+            self.binary = True
+
+def _path_from_header(line: str) -> str:
+    spec = line[len("diff --git "):].rstrip("\n")
+    # "a/<p> b/<p>" for everything but renames/copies, which fix the path later
+    length = (len(spec) - 5) // 2
+    if spec.startswith("a/") and spec[2:2 + length] == spec[5 + length:]:
+        return spec[2:2 + length]
+    return spec.rsplit(" b/", 1)[-1]
+
+def iter_file_diffs(args, keep_chars: int = None, total_chars: int = None):
+    """
+    Stream `git diff <args>` and yield one FileDiff per file.
+
+    Hunk text is only retained while a file stays under keep_chars, and while
+    the hunks retained by all files so far stay under total_chars; beyond that
+    only line counts are kept (and the file is marked truncated). With both
+    limits set, a caller that keeps every FileDiff holds at most total_chars
+    of hunk text plus one stat entry per file. Binary files keep no hunks.
+    Lockfiles and generated files keep theirs for the secret scanner even
+    though they are never sent to the model.
+    """
+    proc = gitexec.popen(
+        ["-c", "core.quotePath=false", "diff", "--no-color", "--no-ext-diff", "-M", "--full-index", *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        encoding="utf-8",
+        errors="replace"
+    )
+    current = None
+    hunk = None
+    retain = False
+    retained = 0
+
+    def finish():
+        if hunk and retain:
+            current.hunks.append("".join(hunk))
+
+    try:
+        for line in proc.stdout:
+            if line.startswith("diff --git "):
+                if current is not None:
+                    finish()
+                    yield current
+                current = FileDiff(line)
+                hunk = None
+                continue
+            if current is None:
+                continue
+            if hunk is None and not line.startswith("@@"):
+                current._parse_header(line)
+                continue
+            if line.startswith("@@"):
+                if hunk is None:
+                    retain = not current.binary
+                finish()
+                hunk = []
+            elif line.startswith("+"):
+                current.added += 1
+            elif line.startswith("-"):
+                current.removed += 1
+            if retain:
+                if ((keep_chars is not None and current.size + len(line) > keep_chars)
+                        or (total_chars is not None and retained + len(line) > total_chars)):
+                    retain = False
+                    current.truncated = True
+                    hunk = []
+                    continue
+                hunk.append(line)
+                current.size += len(line)
+                retained += len(line)
+        if current is not None:
+            finish()
+            yield current
+    finally:
+        proc.stdout.close()
+        proc.wait()
+        gitexec.finished(proc)
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def default_budget() -> int:
+    try:
+        return int(os.getenv("GITGUARD_DIFF_BUDGET", DEFAULT_TOKEN_BUDGET))
+    except ValueError:
+        return DEFAULT_TOKEN_BUDGET
+
+def pack_files(files, budget_tokens: int = None) -> str:
+    """
+    Fit already-parsed file diffs into a token budget.
+
+    Every file gets a line in the summary. Skipped files (lockfiles, generated,
+    binary) are only summarised. The rest are ranked by priority and size:
+    whole files are packed first, then any remaining budget is spent on the
+    individual hunks of files that did not fit whole.
+    """
+    if not files:
+        return ""
+    budget = (budget_tokens or default_budget()) * CHARS_PER_TOKEN
+
+    added = sum(f.added for f in files)
+    removed = sum(f.removed for f in files)
+    summary = [f"Changed files ({len(files)}, +{added} -{removed}):\n"]
+    summary_budget = budget // 4
+    used = len(summary[0])
+    for i, f in enumerate(files):
+        line = f.stat_line()
+        if f.skip_reason:
+            line += f" [skipped: {f.skip_reason}]"
+        if used + len(line) + 1 > summary_budget:
+            summary.append(f"  ... and {len(files) - i} more files\n")
+            break
+        summary.append(line + "\n")
+        used += len(line) + 1
+    summary_text = "".join(summary)
+    remaining = budget - len(summary_text)
+
+    candidates = sorted(
+        (f for f in files if f.skip_reason is None and f.hunks),
+        key=lambda f: (f.priority, f.size)
+    )
+    chosen = {}
+    for f in candidates:
+        if not f.truncated and f.size <= remaining:
+            chosen[id(f)] = f.hunks
+            remaining -= f.size
+    for f in candidates:
+        if id(f) in chosen:
+            continue
+        room = remaining - len(f.header_text)
+        hunks = []
+        for h in f.hunks:
+            if len(h) <= room:
+                hunks.append(h)
+                room -= len(h)
+        if hunks:
+            chosen[id(f)] = hunks
+            remaining = room
+
+    parts = [summary_text]
+    omitted = []
+    for f in files:
+        hunks = chosen.get(id(f))
+        if hunks is None:
+            if f.skip_reason is None and (f.hunks or f.truncated):
+                omitted.append(f.path)
+            continue
+        parts.append("\n" + f.text(hunks))
+        if len(hunks) < len(f.hunks) or f.truncated:
+            parts.append(f"[... remaining changes in {f.path} omitted ...]\n")
+    if omitted:
+        parts.append(f"\n[Diff omitted for {len(omitted)} file(s) to fit the budget: {', '.join(omitted[:20])}]\n")
+    return "".join(parts)
+
+def pack_diff(args=("--cached",), budget_tokens: int = None) -> str:
+    """Stream `git diff <args>` and pack it into a token budget (see pack_files)."""
+    budget_chars = (budget_tokens or default_budget()) * CHARS_PER_TOKEN
+    try:
+        files = list(iter_file_diffs(list(args), keep_chars=budget_chars,
+                                     total_chars=budget_chars * RETAIN_BUDGET_FACTOR))
+    except OSError as e:
+        logger.error(f"Could not read diff: {e}")
+        return ""
+    packed = pack_files(files, budget_tokens)
+    if packed:
+        logger.info(f"Packed diff of {len(files)} file(s) into ~{estimate_tokens(packed)} tokens")
+    return packed
+
+def _split_hunk(hunk: str, room: int):
+    """
+    Split one hunk into pieces of at most about room characters on line boundaries.
+
+    Each piece starts with the hunk's @@ header. A single line longer than a
+    piece is itself split, with its +/-/space marker repeated, so no content
+    is dropped.
+    """
+    header, _, body = hunk.partition("\n")
+    header += "\n"
+    room = max(room - len(header), 80)
+    piece, piece_size = [], 0
+    for line in body.splitlines(keepends=True):
+        segments = [line]
+        if len(line) > room:
+            marker, rest = line[:1], line[1:]
+            step = room - 2
+            segments = [marker + rest[i:i + step] + ("" if rest[i:i + step].endswith("\n") else "\n")
+                        for i in range(0, len(rest), step)]
+        for segment in segments:
+            if piece and piece_size + len(segment) > room:
+                yield header + "".join(piece)
+                piece, piece_size = [], 0
+            piece.append(segment)
+            piece_size += len(segment)
+    if piece or not body:
+        yield header + "".join(piece)
+
+def chunk_files(files, chunk_tokens: int = None, incomplete: list = None):
+    """
+    Split file diffs into self-contained chunks of at most chunk_tokens each.
+
+    Small files are grouped together; a file larger than one chunk is split at
+    hunk boundaries with its header repeated, and a hunk larger than one chunk
+    (e.g. a new file) is split on line boundaries with its @@ header repeated,
+    so every chunk reads as a valid diff on its own. Skipped files (lockfiles,
+    generated, binary) are left out.
+
+    Args:
+        incomplete: If given, paths whose hunks were not all retained (see
+            iter_file_diffs keep_chars) are appended to it
+    """
+    limit = (chunk_tokens or default_budget()) * CHARS_PER_TOKEN
+    group = []
+    group_size = 0
+    for f in files:
+        if f.skip_reason or not f.hunks:
+            continue
+        if f.truncated and incomplete is not None:
+            incomplete.append(f.path)
+        text = f.text()
+        if len(text) <= limit:
+            if group and group_size + len(text) > limit:
+                yield "".join(group)
+                group, group_size = [], 0
+            group.append(text)
+            group_size += len(text)
+            continue
+
+        header = f.header_text
+        room = max(limit - len(header), 1)
+        piece, piece_size = [], 0
+        for hunk in f.hunks:
+            for h in (_split_hunk(hunk, room) if len(hunk) > room else [hunk]):
+                if piece and piece_size + len(h) > room:
+                    yield header + "".join(piece)
+                    piece, piece_size = [], 0
+                piece.append(h)
+                piece_size += len(h)
+        if piece:
+            yield header + "".join(piece)
+    if group:
+        yield "".join(group)
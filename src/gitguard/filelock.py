@@ -0,0 +1,49 @@
+import contextlib
+import os
+
+if os.name == 'nt':
+    import msvcrt
+
+    def lock_fd(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+    def try_lock_fd(fd) -> bool:
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def unlock_fd(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def lock_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def try_lock_fd(fd) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def unlock_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold an exclusive advisory lock on path (created if missing) for the block."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        lock_fd(fd)
+        try:
+            yield
+        finally:
+            unlock_fd(fd)
+    finally:
+        os.close(fd)
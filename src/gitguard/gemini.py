@@ -1,14 +1,29 @@
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 import os
 import typer
 from pydantic import BaseModel, Field
 import json
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import time
 import logging
 
+from .cache import CACHE_TTLS, cache_for, make_key
+from .scanner import SEVERITY_ORDER
+from .transport import api_base_url, make_http_client, request_timeout
+from . import cassette, ratelimit
+from .jsonstream import PartialJSONParser
+from .ui import print
+from .timing import span
+
 logger = logging.getLogger(__name__)
 
+MODEL = "gemini-2.5-flash"
+DEFAULT_AUDIT_CONCURRENCY = 4
+
 class GitPlan(BaseModel):
     risk: str = Field(..., description="Risk level: LOW, MEDIUM, or HIGH")
     summary: str = Field(..., description="Short explanation of what will happen")
@@ -35,18 +50,191 @@ class CommandExplanation(BaseModel):
     risks: str = Field(..., description="Potential risks or side effects")
     related_commands: list[str] = Field(..., description="Related commands to learn")
 
+_clients = {}
+_clients_lock = threading.Lock()
+
 def get_client():
+    """
+    Return the process-wide Gemini client for the current key, timeout and endpoint.
+
+    Clients are kept in a registry so every call in a command (and every
+    command in the daemon) shares one keep-alive connection pool.
+    """
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
+        if not cassette.replay_only():
+            return None
+        # Replaying never reaches the API, so CI needs no real key
+        api_key = "cassette-replay"
+    timeout = request_timeout()
+    base_url = api_base_url()
+    key = (hashlib.sha256(api_key.encode()).hexdigest(), timeout, base_url, cassette.settings())
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _new_client(api_key, timeout, base_url)
+        return client
+
+def _new_client(api_key: str, timeout: float, base_url: str = None):
+    options = {"timeout": int(timeout * 1000)}
+    if base_url:
+        options["base_url"] = base_url
+    try:
+        http_options = types.HttpOptions(**options, httpx_client=make_http_client(timeout))
+    except (TypeError, ValueError):
+        # Older google-genai without httpx_client: pooling is then per client only
+        http_options = types.HttpOptions(**options)
+    logger.info(f"Created Gemini client (timeout {timeout:.0f}s{', endpoint ' + base_url if base_url else ''})")
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+def _retry_hint(e: Exception):
+    """
+    Seconds the API asked us to wait before retrying e, 0 if it did not say,
+    or None when e is not worth retrying (only 429 and 5xx answers are).
+    """
+    code = getattr(e, "code", None)
+    if not isinstance(e, errors.APIError) or not isinstance(code, int):
+        return None
+    if code != 429 and code < 500:
         return None
-    return genai.Client(api_key=api_key)
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after", 0)))
+    except (TypeError, ValueError):
+        return 0.0
 
-def get_git_plan(intent: str, context: dict = None):
-    client = get_client()
-    if not client:
-        print("[red]Error: GEMINI_API_KEY not found.[/red]")
-        raise typer.Exit(1)
+_schema_keys = {}
+
+def _schema_key(schema) -> str:
+    if schema not in _schema_keys:
+        _schema_keys[schema] = make_key(schema.__name__, schema.model_json_schema())
+    return _schema_keys[schema]
+
+def _generate_json(kind: str, prompt: str, schema, temperature: float, state=None):
+    """
+    Run a structured Gemini request, serving it from the response cache when possible.
+
+    Args:
+        kind: Call type (plan, fix, commit, audit, explain, learn); selects cache scope and TTL
+        prompt: Full prompt text
+        schema: Pydantic model the response must follow
+        temperature: Sampling temperature
+        state: Extra repository state the answer depends on (staged tree, context)
+
+    Returns:
+        Parsed JSON response, or None if no API key is configured
+    """
+    with span(f"gemini.{kind}", prompt_bytes=len(prompt)) as s:
+        cache = cache_for(kind)
+        key = make_key(MODEL, _schema_key(schema), temperature, prompt, state)
+        if cache is not None:
+            cached = cache.get(key, CACHE_TTLS[kind])
+            if cached is not None:
+                logger.info(f"Cache hit for {kind} request")
+                s.set(cache="hit")
+                return cached
+
+        client = get_client()
+        if not client:
+            return None
+
+        def call():
+            response = client.models.generate_content(
+                model=MODEL,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=schema,
+                    temperature=temperature,
+                )
+            )
+            s.set(response_bytes=len(response.text or ""))
+            return json.loads(response.text)
+
+        result = ratelimit.single_flight(key, lambda: ratelimit.call_with_retries(call, _retry_hint, f"Gemini {kind} request"))
+        s.set(cache="miss" if cache is not None else "off")
+        if cache is not None:
+            cache.put(key, result)
+        return result
+
+def streaming_enabled() -> bool:
+    return not os.getenv("GITGUARD_NO_STREAM")
+
+def _stream_json(kind: str, prompt: str, schema, temperature: float, on_update, state=None):
+    """
+    Like _generate_json, but streams the response and reports partial objects.
+
+    on_update is called with each new partial dict as fields arrive (see
+    jsonstream.PartialJSONParser). The finished object is validated against
+    schema before it is cached and returned; a cache hit is reported once.
+
+    Raises:
+        pydantic.ValidationError: If the finished response does not match schema
+    """
+    with span(f"gemini.{kind}", prompt_bytes=len(prompt), streamed=True) as s:
+        cache = cache_for(kind)
+        key = make_key(MODEL, _schema_key(schema), temperature, prompt, state)
+        if cache is not None:
+            cached = cache.get(key, CACHE_TTLS[kind])
+            if cached is not None:
+                logger.info(f"Cache hit for {kind} request")
+                s.set(cache="hit")
+                on_update(cached)
+                return cached
 
+        client = get_client()
+        if not client:
+            return None
+        delivered = []
+
+        def call():
+            parser = PartialJSONParser()
+            last = None
+            chunks = 0
+            started = time.perf_counter()
+            for chunk in client.models.generate_content_stream(
+                model=MODEL,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=schema,
+                    temperature=temperature,
+                )
+            ):
+                if not chunk.text:
+                    continue
+                if not chunks:
+                    s.set(first_chunk_ms=round((time.perf_counter() - started) * 1000, 1))
+                chunks += 1
+                partial = parser.feed(chunk.text)
+                if partial is not None and partial != last:
+                    last = partial
+                    delivered.append(True)
+                    on_update(partial)
+            s.set(response_bytes=len(parser.buffer), chunks=chunks)
+            result = json.loads(parser.buffer)
+            schema.model_validate(result)
+            return result
+
+        def retry_hint(e):
+            # Once partial output has been shown, a retry would replay it from the start
+            return None if delivered else _retry_hint(e)
+
+        result = ratelimit.single_flight(key, lambda: ratelimit.call_with_retries(call, retry_hint, f"Gemini {kind} request"))
+        if not delivered:
+            # Served by another process's identical request
+            on_update(result)
+        s.set(cache="miss" if cache is not None else "off")
+        if cache is not None:
+            cache.put(key, result)
+        return result
+
+def _request_json(kind: str, prompt: str, schema, temperature: float, state=None, on_update=None):
+    if on_update is not None and streaming_enabled():
+        return _stream_json(kind, prompt, schema, temperature, on_update, state=state)
+    return _generate_json(kind, prompt, schema, temperature, state=state)
+
+def get_git_plan(intent: str, context: dict = None, on_update=None):
     context_str = ""
     if context:
         branches_str = ", ".join(context.get('all_branches', [])) if context.get('all_branches') else "None"
@@ -108,27 +296,19 @@ def get_git_plan(intent: str, context: dict = None):
 
     try:
         logger.info(f"Requesting AI plan for intent: {intent}")
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=GitPlan,
-                temperature=0.2,
-            )
-        )
-        plan = json.loads(response.text)
-        logger.info(f"AI plan generated: {plan}")
-        return plan
+        plan = _request_json("plan", prompt, GitPlan, 0.2, state=context, on_update=on_update)
     except Exception as e:
         logger.error(f"AI plan generation failed: {e}")
         print(f"[red]AI Error: {e}[/red]")
         return {"risk": "UNKNOWN", "summary": "Failed to generate plan", "commands": []}
 
+    if plan is None:
+        print("[red]Error: GEMINI_API_KEY not found.[/red]")
+        raise typer.Exit(1)
+    logger.info(f"AI plan generated: {plan}")
+    return plan
+
 def get_fix_plan(intent: str, failed_commands: list[str], error_message: str, command_history: list[str] = None, context: dict = None):
-    client = get_client()
-    if not client: return None
-    
     history_text = ""
     if command_history:
         history_text = "\nCOMMAND HISTORY:\n" + "\n".join([f"- {cmd}" for cmd in command_history[-5:]])  # Last 5 only
@@ -178,26 +358,16 @@ def get_fix_plan(intent: str, failed_commands: list[str], error_message: str, co
 
     try:
         logger.info(f"Requesting fix plan for error: {error_message}")
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=GitPlan,
-                temperature=0.2,
-            )
-        )
-        fix = json.loads(response.text)
+        fix = _generate_json("fix", prompt, GitPlan, 0.2)
+        if fix is None:
+            return None
         logger.info(f"Fix plan generated: {fix}")
         return fix
     except Exception as e:
         logger.error(f"Fix plan generation failed: {e}")
         return None
 
-def generate_commit_message(diff: str):
-    client = get_client()
-    if not client: return None
-
+def generate_commit_message(diff: str, staged_tree: str = None):
     prompt = f"""
     Generate a Conventional Commit message for this diff.
     
@@ -206,8 +376,8 @@ def generate_commit_message(diff: str):
     - Types: feat, fix, docs, style, refactor, test, chore
     - Example: "feat(auth): add password reset functionality"
     
-    Diff (truncated):
-    {diff[:10000]}
+    Diff (large diffs are packed: a file summary, then the most relevant files and hunks):
+    {diff}
     
     Generate:
     - subject: Keep under 50 characters
@@ -216,28 +386,23 @@ def generate_commit_message(diff: str):
     
     try:
         logger.info("Generating commit message")
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=CommitMessage,
-                temperature=0.2,
-            )
-        )
-        return json.loads(response.text)
+        return _generate_json("commit", prompt, CommitMessage, 0.2, state=staged_tree)
     except Exception as e:
         logger.error(f"Commit message generation failed: {e}")
         print(f"[red]AI Error: {e}[/red]")
         return None
 
-def audit_code(diff: str):
-    client = get_client()
-    if not client: return None
+PRESCANNED_NOTE = """
+    NOTE: A local scanner has already checked every added line for secrets, private keys,
+    debug statements and TODO/FIXME markers; detected secret values appear as [REDACTED].
+    Do not report those again. Focus on what a pattern matcher cannot judge: logic bugs,
+    sensitive data in context, commented-out code and missing error handling.
+    """
 
-    prompt = f"""
+def _audit_prompt(diff: str, prescanned: bool = False) -> str:
+    return f"""
     Audit this git diff for common issues that beginners might miss:
-    
+    {PRESCANNED_NOTE if prescanned else ""}    
     CHECK FOR:
     1. Hardcoded secrets (API keys, passwords, tokens)
     2. Sensitive data (emails, phone numbers, private keys)
@@ -247,39 +412,71 @@ def audit_code(diff: str):
     6. Obvious bugs (null pointer risks, infinite loops)
     7. Missing error handling
     
-    Diff (truncated):
-    {diff[:10000]}
+    Diff (large changes are audited in several independent slices):
+    {diff}
     
     Be educational - explain WHY each issue matters.
     """
-    
+
+def audit_concurrency() -> int:
     try:
-        logger.info("Running code audit")
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=AuditResult,
-                temperature=0.2,
-            )
-        )
-        return json.loads(response.text)
-    except Exception as e:
-        logger.error(f"Code audit failed: {e}")
-        print(f"[red]AI Error: {e}[/red]")
-        return None
+        return max(1, int(os.getenv("GITGUARD_AUDIT_CONCURRENCY", DEFAULT_AUDIT_CONCURRENCY)))
+    except ValueError:
+        return DEFAULT_AUDIT_CONCURRENCY
 
-def explain_changes(diff: str):
-    client = get_client()
-    if not client: return None
+def merge_audit_results(results: list[dict]) -> dict:
+    """Combine per-chunk audit results: highest severity, de-duplicated issues, all must pass."""
+    issues = []
+    seen = set()
+    severity = "LOW"
+    passed = True
+    for result in results:
+        for issue in result.get("issues", []):
+            key = " ".join(issue.lower().split())
+            if key not in seen:
+                seen.add(key)
+                issues.append(issue)
+        chunk_severity = str(result.get("severity", "LOW")).upper()
+        if SEVERITY_ORDER.get(chunk_severity, 1) > SEVERITY_ORDER[severity]:
+            severity = chunk_severity if chunk_severity in SEVERITY_ORDER else "MEDIUM"
+        passed = passed and bool(result.get("passed", False))
+    return {"issues": issues, "severity": severity, "passed": passed}
+
+def audit_each(chunks: list[str], concurrency: int = None, prescanned: bool = False) -> list:
+    """
+    Audit independent diff chunks over a bounded thread pool.
 
+    Each chunk is a self-contained slice of the diff (see diffpack.chunk_files)
+    and is cached on its own content, so unchanged chunks are free on re-runs.
+    Pass prescanned=True when the chunks went through scanner.redact(), so the
+    model skips what the local scanner already covers.
+
+    Returns:
+        One entry per chunk, in order: the AuditResult dict, None if no API key
+        is configured, or the exception the request failed with
+    """
+    if not chunks:
+        return []
+    workers = min(concurrency or audit_concurrency(), len(chunks))
+    logger.info(f"Auditing {len(chunks)} chunk(s) with concurrency {workers}")
+
+    def audit_one(chunk):
+        try:
+            return _generate_json("audit", _audit_prompt(chunk, prescanned), AuditResult, 0.2)
+        except Exception as e:
+            logger.error(f"Chunk audit failed: {e}")
+            return e
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(audit_one, chunks))
+
+def explain_changes(diff: str, on_update=None):
     prompt = f"""
     Explain these code changes to a non-technical person in plain English.
     Imagine explaining to a project manager or designer who doesn't code.
     
-    Diff (truncated):
-    {diff[:10000]}
+    Diff (large diffs are packed: a file summary, then the most relevant files and hunks):
+    {diff}
     
     Provide:
     - summary: One paragraph overview
@@ -288,25 +485,14 @@ def explain_changes(diff: str):
     
     try:
         logger.info("Generating change explanation")
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=Explanation,
-                temperature=0.2,
-            )
-        )
-        return json.loads(response.text)
+        return _request_json("explain", prompt, Explanation, 0.2, on_update=on_update)
     except Exception as e:
         logger.error(f"Change explanation failed: {e}")
         print(f"[red]AI Error: {e}[/red]")
         return None
 
-def explain_command(command: str):
+def explain_command(command: str, on_update=None):
     """Explain what a git command does - educational feature"""
-    client = get_client()
-    if not client: return None
 
     prompt = f"""
     Explain this git command to a beginner who is learning Git:
@@ -321,16 +507,7 @@ def explain_command(command: str):
     """
     
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=CommandExplanation,
-                temperature=0.3,
-            )
-        )
-        return json.loads(response.text)
+        return _request_json("learn", prompt, CommandExplanation, 0.3, on_update=on_update)
     except Exception as e:
         logger.error(f"Command explanation failed: {e}")
         return None
\ No newline at end of file
@@ -1,69 +1,173 @@
 import os
-import json
 import pathlib
 import subprocess
 import shlex
 import re
-from git import Repo
+import bisect
 from datetime import datetime, timedelta
-import typer
-from rich import print
 import logging
 
+from . import gitexec
+from .ui import print, confirm, emit
+from .timing import span
+from .git_worker import get_worker
+from .journal import CheckpointJournal
+from .snapshot import take_snapshot, restore_snapshot
+
 logger = logging.getLogger(__name__)
 
 MAX_CHECKPOINTS = 10
 CHECKPOINT_RETENTION_DAYS = 30
+# Checkpoints are hidden refs so they never show up in `git branch`;
+# BACKUP_BRANCH_PREFIX is the legacy branch naming, kept for migration.
+CHECKPOINT_REF_PREFIX = "refs/gitguard/checkpoints/"
+BACKUP_BRANCH_PREFIX = "gitguard-backup-"
+# Pack refs once this many checkpoints are stored as loose ref files
+PACK_REFS_THRESHOLD = 64
 
 def is_git_repo():
     return os.path.exists('.git')
 
-def get_repo():
-    return Repo('.')
+STATUS_CHUNK_SIZE = 64 * 1024
+
+def _iter_nul_records(stream, chunk_size=STATUS_CHUNK_SIZE):
+    """Yield NUL-terminated records from a binary stream without buffering it all."""
+    pending = b""
+    while True:
+        chunk = stream.read1(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        *records, pending = pending.split(b"\0")
+        yield from records
+    if pending:
+        yield pending
+
+def read_repo_status():
+    """
+    Read branch, upstream and worktree state from a single git invocation.
+
+    Parses `git status --porcelain=v2 --branch -z` as it streams. Headers always
+    precede entries, so once an untracked entry has been seen nothing else can
+    change the result and the walk is abandoned early.
 
-def get_current_branch():
+    Returns:
+        Dict with oid, branch, detached, upstream, ahead, behind,
+        has_uncommitted and has_untracked
+
+    Raises:
+        subprocess.CalledProcessError: If git status fails
+    """
+    state = {
+        "oid": None,
+        "branch": None,
+        "detached": False,
+        "upstream": None,
+        "ahead": 0,
+        "behind": 0,
+        "has_uncommitted": False,
+        "has_untracked": False
+    }
+    cmd = ["git", "--no-optional-locks", "status", "--porcelain=v2", "--branch", "-z"]
+    proc = gitexec.popen(cmd[1:], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stopped_early = False
+    try:
+        skip_orig_path = False
+        for record in _iter_nul_records(proc.stdout):
+            if skip_orig_path:
+                # Rename/copy entries carry their original path as an extra record
+                skip_orig_path = False
+                continue
+            kind = record[:1]
+            if kind == b"#":
+                key, _, value = record[2:].decode("utf-8", "surrogateescape").partition(" ")
+                if key == "branch.oid":
+                    state["oid"] = None if value == "(initial)" else value
+                elif key == "branch.head":
+                    if value == "(detached)":
+                        state["detached"] = True
+                    else:
+                        state["branch"] = value
+                elif key == "branch.upstream":
+                    state["upstream"] = value
+                elif key == "branch.ab":
+                    ahead, _, behind = value.partition(" ")
+                    state["ahead"] = abs(int(ahead))
+                    state["behind"] = abs(int(behind))
+            elif kind in (b"1", b"2", b"u"):
+                state["has_uncommitted"] = True
+                skip_orig_path = kind == b"2"
+            elif kind == b"?":
+                state["has_uncommitted"] = True
+                state["has_untracked"] = True
+                stopped_early = True
+                break
+    finally:
+        if stopped_early:
+            proc.kill()
+        proc.stdout.close()
+        stderr = proc.stderr.read()
+        proc.stderr.close()
+        proc.wait()
+        gitexec.finished(proc)
+
+    if not stopped_early and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr.decode(errors="replace"))
+    return state
+
+def get_current_branch(status=None):
     """Returns the current active branch name with better edge case handling."""
+    if status is not None:
+        if status["detached"]:
+            return f"detached@{(status['oid'] or '')[:7]}"
+        return status["branch"] or "main (no commits yet)"
+
+    # No status walk needed for a single field: answer from the ref snapshot
+    worker = get_worker()
+    branch = worker.current_branch()
+    if branch:
+        return branch
+    head = worker.resolve("HEAD")
+    if head:
+        return f"detached@{head[:7]}"
     try:
-        result = subprocess.run(
-            ["git", "symbolic-ref", "--short", "HEAD"],
-            capture_output=True, 
-            text=True, 
-            check=True
-        )
-        return result.stdout.strip()
+        # Unborn branch: HEAD names a branch that has no ref yet
+        return gitexec.output(["symbolic-ref", "--short", "HEAD"])
     except subprocess.CalledProcessError:
-        # Detached HEAD state
-        try:
-            result = subprocess.run(
-                ["git", "rev-parse", "--short", "HEAD"],
-                capture_output=True, 
-                text=True, 
-                check=True
-            )
-            return f"detached@{result.stdout.strip()}"
-        except:
-            # Brand new repo, no commits yet
-            return "main (no commits yet)"
+        return "main (no commits yet)"
 
 def get_remotes():
     """Returns a list of configured remotes."""
     try:
-        result = subprocess.run(
-            ["git", "remote"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout.strip().splitlines()
-    except:
+        return get_worker().remotes()
+    except Exception:
         return []
 
+def get_local_branches():
+    """Returns local branch names, excluding GitGuard backup branches."""
+    heads = get_worker().refs("refs/heads/")
+    names = [name[len("refs/heads/"):] for name in heads]
+    return [name for name in names if not name.startswith(BACKUP_BRANCH_PREFIX)]
+
 def gather_context():
-    """Gather comprehensive git repository context."""
+    """
+    Gather comprehensive git repository context.
+
+    Always read fresh: worktree edits, untracked files and new loose refs leave
+    no trace in the metadata a cache could key on, and the fast planner and
+    safety checks act on these fields.
+    """
+    with span("git.context"):
+        return _gather_context()
+
+def _gather_context():
     context = {
         "os": os.name,  # 'posix' or 'nt'
-        "branch": get_current_branch(),
+        "branch": "main (no commits yet)",
+        "detached": False,
+        "upstream": None,
         "remotes": get_remotes(),
+        "all_branches": [],
         "has_uncommitted": False,
         "has_untracked": False,
         "ahead": 0,
@@ -71,29 +175,11 @@ def gather_context():
     }
     
     try:
-        # Check for uncommitted/untracked changes
-        result = subprocess.run(
-            ["git", "status", "--porcelain"], 
-            capture_output=True, 
-            text=True,
-            check=True
-        )
-        status_output = result.stdout.strip()
-        context["has_uncommitted"] = bool(status_output)
-        context["has_untracked"] = "??" in status_output
-        
-        # Check ahead/behind status
-        result = subprocess.run(
-            ["git", "rev-list", "--left-right", "--count", "HEAD...@{upstream}"],
-            capture_output=True, 
-            text=True, 
-            check=False
-        )
-        if result.returncode == 0:
-            parts = result.stdout.strip().split()
-            if len(parts) == 2:
-                context["ahead"] = int(parts[0])
-                context["behind"] = int(parts[1])
+        status = read_repo_status()
+        context["branch"] = get_current_branch(status)
+        for key in ("detached", "upstream", "has_uncommitted", "has_untracked", "ahead", "behind"):
+            context[key] = status[key]
+        context["all_branches"] = get_local_branches()
     except Exception as e:
         logger.warning(f"Could not gather full context: {e}")
     
@@ -150,106 +236,131 @@ def sanitize_git_input(user_input: str, input_type: str = "general") -> str:
     return user_input
 
 def create_checkpoint():
-    """Create a backup branch before risky operations with automatic cleanup."""
-    try:
-        # Check if there are any commits
-        result = subprocess.run(
-            ["git", "rev-parse", "HEAD"],
-            capture_output=True,
-            text=True,
-            check=False
-        )
-        
-        if result.returncode != 0:
-            print("[yellow]Skipping checkpoint - no commits yet[/yellow]")
-            return None
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_branch = f"gitguard-backup-{timestamp}"
-        
-        subprocess.run(
-            ["git", "branch", backup_branch],
-            check=True,
-            capture_output=True
-        )
-        logger.info(f"Created checkpoint branch: {backup_branch}")
+    """
+    Snapshot HEAD, index and worktree before risky operations, with automatic cleanup.
 
-        # Try to stash current changes
-        stash_result = subprocess.run(
-            ["git", "stash", "create"],
-            capture_output=True,
-            text=True,
-            check=False
-        )
-        stash_hash = stash_result.stdout.strip()
-        
-        checkpoint_dir = pathlib.Path('.git') / 'gitguard'
-        checkpoint_dir.mkdir(parents=True, exist_ok=True)
-        checkpoint_file = checkpoint_dir / 'checkpoints.json'
-        
-        checkpoints = []
-        if checkpoint_file.exists():
-            try:
-                with open(checkpoint_file) as f:
-                    checkpoints = json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
-        
-        new_checkpoint = {
-            "ref": backup_branch,
-            "created": timestamp,
-            "stash": stash_hash if stash_hash else None
-        }
-        checkpoints.insert(0, new_checkpoint)
-        
-        # Auto-cleanup: Keep only MAX_CHECKPOINTS most recent
-        if len(checkpoints) > MAX_CHECKPOINTS:
-            for old_checkpoint in checkpoints[MAX_CHECKPOINTS:]:
-                try:
-                    subprocess.run(
-                        ["git", "branch", "-D", old_checkpoint['ref']],
-                        capture_output=True,
-                        check=False
-                    )
-                    logger.info(f"Auto-deleted old checkpoint: {old_checkpoint['ref']}")
-                except:
-                    pass
-            checkpoints = checkpoints[:MAX_CHECKPOINTS]
-        
-        # Auto-cleanup: Delete checkpoints older than CHECKPOINT_RETENTION_DAYS
-        cutoff_date = datetime.now() - timedelta(days=CHECKPOINT_RETENTION_DAYS)
-        checkpoints_to_keep = []
-        for cp in checkpoints:
-            try:
-                cp_date = datetime.strptime(cp['created'], "%Y%m%d_%H%M%S")
-                if cp_date >= cutoff_date:
-                    checkpoints_to_keep.append(cp)
-                else:
-                    subprocess.run(
-                        ["git", "branch", "-D", cp['ref']],
-                        capture_output=True,
-                        check=False
-                    )
-                    logger.info(f"Auto-deleted expired checkpoint: {cp['ref']}")
-            except:
-                checkpoints_to_keep.append(cp)  # Keep if we can't parse date
-        
-        checkpoints = checkpoints_to_keep
-        
-        with open(checkpoint_file, 'w') as f:
-            json.dump(checkpoints, f, indent=2)
-        
-        msg = f"[green]✓[/green] Checkpoint created: {backup_branch}"
-        if stash_hash:
-            msg += " (with local changes saved)"
-        print(msg)
-        return backup_branch
-        
-    except Exception as e:
-        logger.error(f"Checkpoint creation failed: {e}")
-        print(f"[yellow]Warning: Could not create checkpoint: {e}[/yellow]")
+    Returns:
+        The checkpoint ref, or None if there is nothing to checkpoint (no commits yet)
+
+    Raises:
+        subprocess.CalledProcessError, OSError: If the checkpoint could not be created
+    """
+    with span("checkpoint"):
+        try:
+            return _create_checkpoint()
+        except Exception as e:
+            logger.error(f"Checkpoint creation failed: {e}")
+            raise
+
+def _checkpoint_id(journal, created: str) -> str:
+    """
+    Return an unused checkpoint id for a checkpoint created at `created` (journal lock held).
+
+    Ids are the creation time; checkpoints made within the same second (e.g.
+    concurrent automated runs) get a -2, -3, ... suffix.
+    """
+    taken = {cp['id'] for cp in journal.entries()}
+    cp_id = created
+    n = 1
+    while cp_id in taken or get_worker().resolve(f"{CHECKPOINT_REF_PREFIX}{cp_id}"):
+        n += 1
+        cp_id = f"{created}-{n}"
+    return cp_id
+
+def _create_checkpoint():
+    # Check if there are any commits
+    head = get_worker().resolve("HEAD")
+    if not head:
+        print("[yellow]Skipping checkpoint - no commits yet[/yellow]")
         return None
 
+    journal = CheckpointJournal()
+    with journal.lock():
+        created = datetime.now().strftime("%Y%m%d_%H%M%S")
+        cp_id = _checkpoint_id(journal, created)
+        checkpoint_ref = f"{CHECKPOINT_REF_PREFIX}{cp_id}"
+
+        # Index and worktree (untracked files included) go into the
+        # snapshot commit; the real index and files are left untouched
+        with span("checkpoint.snapshot"):
+            snapshot = take_snapshot(head, label=cp_id)
+
+        # Empty old value: fail rather than overwrite an existing checkpoint
+        gitexec.run(["update-ref", "-m", "gitguard: checkpoint", checkpoint_ref, snapshot["commit"], ""])
+        get_worker().invalidate()
+        logger.info(f"Created checkpoint ref: {checkpoint_ref}")
+
+        journal.add({
+            "id": cp_id,
+            "ref": checkpoint_ref,
+            "created": created,
+            "head": snapshot["head"],
+            "index_tree": snapshot["index_tree"],
+            "worktree_tree": snapshot["worktree_tree"]
+        })
+        with span("checkpoint.prune"):
+            _prune_checkpoints(journal)
+            _maybe_pack_refs()
+
+    head_tree = get_worker().resolve(f"{head}^{{tree}}")
+    msg = f"[green]✓[/green] Checkpoint created: {cp_id}"
+    if head_tree not in (snapshot["index_tree"], None) or snapshot["worktree_tree"] != head_tree:
+        msg += " (with local changes saved)"
+    print(msg)
+    return checkpoint_ref
+
+def _full_ref(ref: str) -> str:
+    """Journal entries from before the refs/gitguard/ namespace store bare branch names."""
+    return ref if ref.startswith("refs/") else f"refs/heads/{ref}"
+
+def _maybe_pack_refs():
+    loose_dir = pathlib.Path('.git') / CHECKPOINT_REF_PREFIX
+    try:
+        loose = sum(1 for _ in loose_dir.iterdir())
+    except OSError:
+        return
+    if loose >= PACK_REFS_THRESHOLD:
+        gitexec.run(["pack-refs", "--all"], check=False)
+        logger.info(f"Packed refs ({loose} loose checkpoint refs)")
+
+def _update_refs(instructions):
+    """
+    Apply `git update-ref --stdin` instructions as one atomic transaction.
+
+    Raises:
+        subprocess.CalledProcessError: If any instruction fails (nothing is applied)
+    """
+    payload = "".join(f"{line}\n" for line in instructions)
+    try:
+        gitexec.run(["update-ref", "--stdin"], input=payload, text=True)
+    finally:
+        get_worker().invalidate()
+
+def _prune_checkpoints(journal):
+    """Drop checkpoints beyond MAX_CHECKPOINTS or older than CHECKPOINT_RETENTION_DAYS (journal lock held)."""
+    cutoff_date = datetime.now() - timedelta(days=CHECKPOINT_RETENTION_DAYS)
+    expired = []
+    for i, cp in enumerate(journal.entries()):
+        if i >= MAX_CHECKPOINTS:
+            expired.append(cp)
+            continue
+        try:
+            if datetime.strptime(cp['created'], "%Y%m%d_%H%M%S") < cutoff_date:
+                expired.append(cp)
+        except (KeyError, ValueError):
+            pass  # Keep if we can't parse date
+    current = _checked_out([_full_ref(cp['ref']) for cp in expired])
+    expired = [cp for cp in expired if _full_ref(cp['ref']) != current]
+    if not expired:
+        return
+    try:
+        _update_refs(f"delete {_full_ref(cp['ref'])}" for cp in expired)
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"Could not prune old checkpoints: {e.stderr}")
+        return
+    logger.info(f"Auto-deleted {len(expired)} old checkpoint(s)")
+    journal.drop(cp['id'] for cp in expired)
+
 def validate_git_command(cmd: str) -> bool:
     """
     Validate that a command is a safe git command.
@@ -297,6 +408,13 @@ def run_git_commands(commands):
     """
     print("\n[bold]Executing Git Commands:[/bold]")
     
+    try:
+        _run_validated_commands(commands)
+    finally:
+        # Any of these may have moved refs or changed remotes
+        get_worker().invalidate()
+
+def _run_validated_commands(commands):
     for cmd in commands:
         # Security validation
         if not validate_git_command(cmd):
@@ -310,13 +428,9 @@ def run_git_commands(commands):
             cmd_parts = shlex.split(cmd)
             
             # Execute without shell
-            result = subprocess.run(
-                cmd_parts,
-                check=True,
-                capture_output=True,
-                text=True,
-                cwd=os.getcwd()
-            )
+            # The user's own commands: timed and logged, but not charged to the budget
+            with span("git.exec", cmd=cmd):
+                result = gitexec.run(cmd_parts[1:], text=True, charge=False)
             
             if result.stdout:
                 print(f"[dim]{result.stdout.strip()}[/dim]")
@@ -331,74 +445,314 @@ def run_git_commands(commands):
                 print(f"[red]{e.stderr.strip()}[/red]")
             raise
 
+def _restore_legacy(cp):
+    """Checkpoints from before snapshots: a plain commit plus an optional stash."""
+    gitexec.run(["reset", "--hard", cp['ref']])
+    if cp.get('stash'):
+        print("[blue]Restoring local changes...[/blue]")
+        try:
+            gitexec.run(["stash", "apply", cp['stash']])
+            print("[green]✓ Local changes restored.[/green]")
+        except Exception as e:
+            print(f"[yellow]Warning: Could not restore local changes cleanly: {e}[/yellow]")
+
+CHECKPOINT_TIME_FORMATS = [
+    "%Y%m%d_%H%M%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M",
+    "%Y-%m-%d",
+]
+
+def list_checkpoints():
+    """Return live checkpoints from the journal, newest first."""
+    return CheckpointJournal().entries()
+
+def _parse_checkpoint_time(spec: str):
+    for fmt in CHECKPOINT_TIME_FORMATS:
+        try:
+            return datetime.strptime(spec, fmt)
+        except ValueError:
+            continue
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            parsed = datetime.strptime(spec, fmt).time()
+        except ValueError:
+            continue
+        return datetime.combine(datetime.now().date(), parsed)
+    return None
+
+def find_checkpoint(spec: str, checkpoints=None):
+    """
+    Resolve a checkpoint by id, unique id prefix, or time.
+
+    A time picks the newest checkpoint created at or before it. Checkpoint ids
+    are their creation timestamps, which sort chronologically, so the lookup
+    is a binary search over the journal listing.
+
+    Returns:
+        The checkpoint dict, or None if nothing matches
+    """
+    checkpoints = list(reversed(checkpoints if checkpoints is not None else list_checkpoints()))
+    by_id = {cp['id']: cp for cp in checkpoints}
+    if spec in by_id:
+        return by_id[spec]
+    prefixed = [cp for cp in checkpoints if cp['id'].startswith(spec)]
+    if len(prefixed) == 1:
+        return prefixed[0]
+
+    when = _parse_checkpoint_time(spec)
+    if when is None:
+        return None
+    created = [cp['created'] for cp in checkpoints]
+    pos = bisect.bisect_right(created, when.strftime("%Y%m%d_%H%M%S"))
+    return checkpoints[pos - 1] if pos else None
+
+def _restore_paths(cp, paths):
+    """
+    Restore only the given paths from a checkpoint, worktree and index separately.
+
+    Paths that do not exist in the checkpoint are skipped with a warning rather
+    than failing the whole restore.
+
+    Returns:
+        Number of files rewritten in the worktree
+    """
+    worktree_source = cp.get('worktree_tree') or cp['ref']
+    index_source = cp.get('index_tree') or cp['ref']
+    listed = gitexec.run(["ls-tree", "-r", "--name-only", "-z", worktree_source, "--", *paths], text=True).stdout
+    known = set()
+    for name in listed.split("\0"):
+        name = os.path.normpath(name) if name else ""
+        while name and name not in known:
+            known.add(name)
+            name = os.path.dirname(name)
+    found = [p for p in paths if os.path.normpath(p) in known]
+    missing = [p for p in paths if os.path.normpath(p) not in known]
+    if missing:
+        print(f"[yellow]Skipping {len(missing)} path(s) not in checkpoint {cp['id']}: {', '.join(missing)}[/yellow]")
+    if not found:
+        return 0
+    pathspec = ["--", *found]
+    changed = gitexec.run(["diff", "--name-only", "-z", worktree_source, *pathspec], text=True).stdout
+    gitexec.run(["restore", f"--source={worktree_source}", "--worktree", *pathspec], text=True)
+    # reset, unlike restore --staged, accepts paths missing from the source (they are unstaged)
+    gitexec.run(["reset", "-q", index_source, *pathspec], text=True)
+    return len([p for p in changed.split("\0") if p])
+
 def rollback_last():
     """Rollback to the most recent checkpoint."""
-    checkpoint_file = pathlib.Path('.git') / 'gitguard' / 'checkpoints.json'
-    if not checkpoint_file.exists():
-        print("[bold red]No checkpoints found![/bold red]")
-        return
-    
-    try:
-        with open(checkpoint_file) as f:
-            checkpoints = json.load(f)
-    except:
-        print("[bold red]Error:[/bold red] Invalid checkpoint file.")
-        return
-    
-    if not checkpoints:
+    rollback_to(None)
+
+def rollback_to(spec=None, paths=None):
+    """
+    Roll back to a checkpoint, optionally only for some paths.
+
+    Args:
+        spec: Checkpoint id, id prefix or time (None for the most recent)
+        paths: Restore only these paths from the checkpoint; HEAD stays put
+    """
+    journal = CheckpointJournal()
+    if spec is None:
+        target = journal.latest()
+    else:
+        target = find_checkpoint(spec, journal.entries())
+        if not target:
+            print(f"[bold red]Error:[/bold red] No checkpoint matches '{spec}'. Use [cyan]gitguard rollback --list[/cyan].")
+            return
+    if not target:
         print("[yellow]No checkpoints available for rollback.[/yellow]")
         return
+
+    if not get_worker().resolve(target['ref']):
+        print(f"[bold red]Error:[/bold red] Checkpoint {target['ref']} no longer exists.")
+        return
+    print(f"\n[bold yellow]Rollback Target:[/bold yellow] {target['ref']} (Created: {target['created']})")
+    if paths:
+        print(f"[bold yellow]Paths:[/bold yellow] {', '.join(paths)}")
+        question = "Restore these paths from the checkpoint?"
+    else:
+        question = "Are you sure you want to revert the repository state to this checkpoint?"
     
-    last = checkpoints[0]
-    print(f"\n[bold yellow]Rollback Target:[/bold yellow] {last['ref']} (Created: {last['created']})")
-    
-    if typer.confirm(f"Are you sure you want to revert the repository state to this checkpoint?", default=False):
-        repo = get_repo()
-        try:
-            repo.git.reset('--hard', last['ref'])
-            logger.info(f"Rolled back to: {last['ref']}")
-            print(f"[bold green]✅ Success![/bold green] Repository rolled back to [cyan]{last['ref']}[/cyan].")
-            
-            if last.get('stash'):
-                print("[blue]Restoring local changes...[/blue]")
-                try:
-                    repo.git.stash('apply', last['stash'])
-                    print("[green]✓ Local changes restored.[/green]")
-                except Exception as e:
-                    print(f"[yellow]Warning: Could not restore local changes cleanly: {e}[/yellow]")
-
-            checkpoints.pop(0)
-            with open(checkpoint_file, 'w') as f:
-                json.dump(checkpoints, f, indent=2)
-        except Exception as e:
-            logger.error(f"Rollback failed: {e}")
-            print(f"[bold red]Rollback failed:[/bold red] {e}")
+    if confirm(question, default=False):
+        with journal.lock():
+            current = journal.get(target['id'])
+            if not current:
+                print("[bold red]Error:[/bold red] Checkpoints changed while waiting; run rollback again.")
+                return
+            try:
+                if paths:
+                    with span("rollback.restore", paths=len(paths)):
+                        restored = _restore_paths(target, paths)
+                    get_worker().invalidate()
+                    logger.info(f"Restored {paths} from: {target['ref']}")
+                    print(f"[bold green]✅ Success![/bold green] Restored {restored} file(s) from [cyan]{target['id']}[/cyan].")
+                    emit("rollback", {"checkpoint": target['id'], "paths": paths, "restored": restored})
+                    return
+
+                with span("rollback.restore"):
+                    if target.get('worktree_tree'):
+                        touched = restore_snapshot(target)
+                    else:
+                        touched = None
+                        _restore_legacy(target)
+                get_worker().invalidate()
+                logger.info(f"Rolled back to: {target['ref']}")
+                print(f"[bold green]✅ Success![/bold green] Repository rolled back to [cyan]{target['id']}[/cyan].")
+                if touched:
+                    index_note = "the whole index" if touched["index_paths"] < 0 else f"{touched['index_paths']} staged path(s)"
+                    print(f"[dim]Rewrote {touched['worktree_paths']} file(s) and {index_note}; everything else was left untouched.[/dim]")
+
+                emit("rollback", {"checkpoint": target['id'], "paths": None, **(touched or {})})
+                if spec is None:
+                    journal.drop([target['id']])
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Rollback failed: {e.stderr}")
+                print(f"[bold red]Rollback failed:[/bold red] {(e.stderr or str(e)).strip()}")
+            except Exception as e:
+                logger.error(f"Rollback failed: {e}")
+                print(f"[bold red]Rollback failed:[/bold red] {e}")
     else:
         print("[yellow]Rollback cancelled.[/yellow]")
 
 def get_staged_diff():
     """Get diff of staged changes."""
     try:
-        return subprocess.check_output(["git", "diff", "--cached"], text=True)
+        return gitexec.run(["diff", "--cached"], text=True).stdout
     except:
         return ""
 
+def get_staged_tree():
+    """Return the tree OID of the current index, or None if it cannot be written (e.g. conflicts)."""
+    try:
+        return gitexec.output(["write-tree"])
+    except (subprocess.SubprocessError, OSError):
+        return None
+
 def get_diff():
     """Get diff of all changes."""
     try:
-        return subprocess.check_output(["git", "diff", "HEAD"], text=True)
+        return gitexec.run(["diff", "HEAD"], text=True).stdout
     except:
         return ""
 
-def list_backup_branches():
-    """List all GitGuard checkpoint branches."""
-    repo = get_repo()
-    return [b.name for b in repo.branches if b.name.startswith("gitguard-backup-")]
+def list_checkpoint_refs():
+    """
+    List checkpoint refs, including not-yet-migrated backup branches.
+
+    Uses one prefix-scoped `for-each-ref` so the cost does not depend on how
+    many other branches and tags the repository has. A backup branch that is
+    checked out is left out, since deleting it would leave HEAD unborn.
+
+    Returns:
+        {refname: oid}, newest first
+    """
+    with span("checkpoints.list") as s:
+        result = gitexec.run(
+            ["for-each-ref", "--format=%(HEAD)%00%(refname)%00%(objectname)",
+             CHECKPOINT_REF_PREFIX, f"refs/heads/{BACKUP_BRANCH_PREFIX}*"],
+            text=True,
+            check=False
+        )
+        refs = {}
+        for line in result.stdout.splitlines():
+            marker, refname, oid = line.split("\0")
+            if marker == "*":
+                logger.warning(f"Skipping checked-out backup branch: {refname}")
+                print(f"[yellow]Skipping {refname}: it is checked out[/yellow]")
+                continue
+            refs[refname] = oid
+        s.set(refs=len(refs))
+        return dict(sorted(refs.items(), reverse=True))
+
+def count_checkpoints():
+    """
+    Count checkpoint refs (and unmigrated backup branches) from the shared ref snapshot.
+
+    Cheaper than list_checkpoint_refs() when the snapshot is already loaded,
+    as it is after gather_context().
+    """
+    worker = get_worker()
+    return len(worker.refs(CHECKPOINT_REF_PREFIX)) + len(worker.refs(f"refs/heads/{BACKUP_BRANCH_PREFIX}"))
+
+def delete_checkpoints(refs):
+    """
+    Delete checkpoint refs in one atomic update-ref transaction and forget
+    them in the journal, under the checkpoint lock.
+
+    Args:
+        refs: {refname: oid} as returned by list_checkpoint_refs(). Each ref is
+            only deleted if it still points at its oid, and the checked-out
+            branch is never deleted.
+
+    Returns:
+        The refs that were deleted
+
+    Raises:
+        subprocess.CalledProcessError: If the transaction fails (nothing is deleted)
+    """
+    journal = CheckpointJournal()
+    with journal.lock(), span("checkpoints.delete", refs=len(refs)):
+        current = _checked_out(refs)
+        if current:
+            logger.warning(f"Not deleting checked-out backup branch: {current}")
+        deleted = {ref: oid for ref, oid in refs.items() if ref != current}
+        if not deleted:
+            return []
+        _update_refs(f"delete {ref} {oid}" for ref, oid in deleted.items())
+        logger.info(f"Deleted {len(deleted)} checkpoint ref(s)")
+        journal.drop(cp['id'] for cp in journal.entries() if _full_ref(cp['ref']) in deleted)
+        return list(deleted)
+
+def _checked_out(refs):
+    """Return the ref among refs that HEAD points at, or None (no git call unless a branch is among them)."""
+    if not any(ref.startswith("refs/heads/") for ref in refs):
+        return None
+    branch = get_worker().current_branch()
+    return f"refs/heads/{branch}" if branch else None
+
+def migrate_backup_branches():
+    """
+    Move legacy gitguard-backup-* branches to refs/gitguard/checkpoints/.
+
+    All refs move in a single update-ref transaction, journal entries are
+    re-pointed at the new refs, and refs are packed afterwards.
+
+    Returns:
+        Number of branches migrated
+    """
+    journal = CheckpointJournal()
+    with journal.lock():
+        branches = get_worker().refs(f"refs/heads/{BACKUP_BRANCH_PREFIX}")
+        current = get_worker().current_branch()
+        moves = {}
+        instructions = []
+        for refname, oid in branches.items():
+            name = refname[len("refs/heads/"):]
+            if name == current:
+                logger.warning(f"Not migrating checked-out backup branch: {name}")
+                continue
+            target = f"{CHECKPOINT_REF_PREFIX}{name[len(BACKUP_BRANCH_PREFIX):]}"
+            moves[refname] = target
+            instructions.append(f"create {target} {oid}")
+            instructions.append(f"delete {refname} {oid}")
+        if not moves:
+            return 0
+        _update_refs(instructions)
+        entries = journal.entries()
+        for cp in entries:
+            cp['ref'] = moves.get(_full_ref(cp['ref']), cp['ref'])
+        journal.compact(entries)
+        gitexec.run(["pack-refs", "--all"], check=False)
+        logger.info(f"Migrated {len(moves)} backup branches to {CHECKPOINT_REF_PREFIX}")
+        return len(moves)
 
 def delete_branch(branch_name):
     """Delete a branch safely."""
     try:
-        subprocess.run(["git", "branch", "-D", branch_name], check=True, capture_output=True)
+        gitexec.run(["branch", "-D", branch_name])
+        get_worker().invalidate()
         logger.info(f"Deleted branch: {branch_name}")
         return True
     except:
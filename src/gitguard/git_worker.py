@@ -0,0 +1,176 @@
+import atexit
+import os
+import subprocess
+import threading
+import logging
+
+from . import gitexec
+
+logger = logging.getLogger(__name__)
+
+class GitWorker:
+    """
+    Long-lived, read-only view of one repository.
+
+    Object lookups go through a single `git cat-file --batch-check` pipe and
+    ref/remote queries are answered from snapshots that are taken once and kept
+    until invalidate() is called, so a command (or a daemon session) pays for
+    process startup a handful of times instead of once per question.
+    """
+
+    def __init__(self, cwd=None):
+        self.cwd = os.path.abspath(cwd or os.getcwd())
+        self._lock = threading.Lock()
+        self._batch = None
+        self._refs = None
+        self._head_ref = None
+        self._remotes = None
+
+    # -- object lookups -------------------------------------------------
+
+    def _start_batch(self):
+        self._batch = gitexec.popen(
+            ["cat-file", "--batch-check=%(objectname) %(objecttype)"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self.cwd
+        )
+
+    def _query(self, rev: str) -> bytes:
+        if self._batch is None or self._batch.poll() is not None:
+            self._start_batch()
+        self._batch.stdin.write(rev.encode("utf-8", "surrogateescape") + b"\n")
+        self._batch.stdin.flush()
+        return self._batch.stdout.readline()
+
+    def resolve(self, rev: str, expected_type: str = None):
+        """
+        Resolve a revision to a full object id.
+
+        Returns:
+            The object id, or None if the revision does not exist (or is not of
+            expected_type when given)
+        """
+        if not rev or "\n" in rev:
+            return None
+        with self._lock:
+            try:
+                line = self._query(rev)
+            except (BrokenPipeError, OSError):
+                # The pipe died underneath us (e.g. git was killed); retry once
+                self._close_batch()
+                line = self._query(rev)
+        parts = line.decode("utf-8", "surrogateescape").split()
+        if len(parts) != 2 or parts[1] in ("missing", "ambiguous"):
+            return None
+        if expected_type and parts[1] != expected_type:
+            return None
+        return parts[0]
+
+    # -- ref and config snapshots ----------------------------------------
+
+    def _load_refs(self):
+        result = gitexec.run(
+            ["for-each-ref", "--format=%(HEAD)%00%(refname)%00%(objectname)"],
+            cwd=self.cwd,
+            check=False
+        )
+        refs = {}
+        head_ref = None
+        if result.returncode == 0:
+            for line in result.stdout.decode("utf-8", "surrogateescape").splitlines():
+                marker, refname, oid = line.split("\0")
+                refs[refname] = oid
+                if marker == "*":
+                    head_ref = refname
+        self._refs, self._head_ref = refs, head_ref
+
+    def refs(self, prefix: str = ""):
+        """Return {refname: oid} for every ref starting with prefix."""
+        with self._lock:
+            if self._refs is None:
+                self._load_refs()
+            refs = self._refs
+        if not prefix:
+            return dict(refs)
+        return {name: oid for name, oid in refs.items() if name.startswith(prefix)}
+
+    def current_branch(self):
+        """Return the short name of the checked-out branch, or None if HEAD is detached or unborn."""
+        with self._lock:
+            if self._refs is None:
+                self._load_refs()
+            head_ref = self._head_ref
+        if head_ref and head_ref.startswith("refs/heads/"):
+            return head_ref[len("refs/heads/"):]
+        return None
+
+    def remotes(self):
+        """Return configured remote names in config order."""
+        with self._lock:
+            if self._remotes is None:
+                result = gitexec.run(
+                    ["config", "-z", "--get-regexp", r"^remote\."],
+                    cwd=self.cwd,
+                    check=False
+                )
+                names = []
+                for entry in result.stdout.decode("utf-8", "surrogateescape").split("\0"):
+                    key = entry.split("\n", 1)[0]
+                    # remote.<name>.<var>, where <name> may itself contain dots
+                    name = key[len("remote."):].rpartition(".")[0]
+                    if name and name not in names:
+                        names.append(name)
+                self._remotes = names
+            return list(self._remotes)
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def invalidate(self):
+        """Drop cached ref/config snapshots after anything that may have changed them."""
+        with self._lock:
+            self._refs = None
+            self._head_ref = None
+            self._remotes = None
+
+    def _close_batch(self):
+        if self._batch is not None:
+            try:
+                self._batch.stdin.close()
+                self._batch.wait(timeout=5)
+            except Exception:
+                self._batch.kill()
+            gitexec.finished(self._batch)
+            self._batch = None
+
+    def close(self):
+        with self._lock:
+            self._close_batch()
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+def get_worker(cwd=None) -> GitWorker:
+    """Return the shared worker for cwd (defaults to the current directory)."""
+    key = os.path.abspath(cwd or os.getcwd())
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            worker = _workers[key] = GitWorker(key)
+        return worker
+
+def invalidate_workers():
+    """Invalidate the snapshots of every live worker."""
+    with _workers_lock:
+        workers = list(_workers.values())
+    for worker in workers:
+        worker.invalidate()
+
+@atexit.register
+def close_workers():
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.close()
@@ -0,0 +1,192 @@
+import os
+import subprocess
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds a git command may run before it is killed (GITGUARD_GIT_TIMEOUT)
+DEFAULT_TIMEOUT = 60.0
+# Network and maintenance commands get longer
+COMMAND_TIMEOUTS = {
+    "push": 600.0,
+    "pull": 600.0,
+    "fetch": 600.0,
+    "clone": 1800.0,
+    "gc": 600.0,
+    "repack": 600.0,
+}
+
+# git processes GitGuard itself may start per CLI command; commands from a
+# plan (`run`) are the user's and are not charged. Measured on the real
+# paths: a full snapshot rollback takes 9 (10 if the index cannot be renamed
+# into place), a clean that deletes checkpoints 2. Override with
+# GITGUARD_GIT_BUDGET. The budget is checked once the command has finished
+# (see over_budget), never midway, so a mutating command is not cut short.
+COMMAND_BUDGETS = {
+    "status": 3,
+    "clean": 2,
+    "rollback": 10,
+}
+
+_lock = threading.Lock()
+_calls = []
+_command = None
+_budget = None
+_charged = 0
+
+def default_timeout() -> float:
+    try:
+        return float(os.getenv("GITGUARD_GIT_TIMEOUT", DEFAULT_TIMEOUT))
+    except ValueError:
+        return DEFAULT_TIMEOUT
+
+def timeout_for(args) -> float:
+    """Timeout for `git <args>`, looking past global options such as -c to the subcommand."""
+    i = 0
+    while i < len(args) and args[i].startswith("-"):
+        i += 2 if args[i] in ("-c", "-C") else 1
+    return max(COMMAND_TIMEOUTS.get(args[i], 0.0) if i < len(args) else 0.0, default_timeout())
+
+def strict() -> bool:
+    return os.getenv("GITGUARD_GIT_STRICT", "") not in ("", "0")
+
+def begin(command: str = None):
+    """
+    Start accounting for one CLI command: clears the call log and sets its budget.
+
+    The budget comes from GITGUARD_GIT_BUDGET, else COMMAND_BUDGETS[command]
+    (None means unlimited).
+    """
+    global _command, _budget, _charged
+    override = os.getenv("GITGUARD_GIT_BUDGET")
+    with _lock:
+        _calls.clear()
+        _command = command
+        _charged = 0
+        try:
+            _budget = int(override) if override else COMMAND_BUDGETS.get(command)
+        except ValueError:
+            _budget = COMMAND_BUDGETS.get(command)
+
+def calls() -> list:
+    """Every git process started since begin(): argv, exit code, ms and output bytes."""
+    with _lock:
+        return [{k: v for k, v in call.items() if not k.startswith("_")} for call in _calls]
+
+def summary() -> dict:
+    with _lock:
+        finished = [c for c in _calls if c["ms"] is not None]
+        return {
+            "command": _command,
+            "processes": len(_calls),
+            "charged": _charged,
+            "budget": _budget,
+            "ms": round(sum(c["ms"] for c in finished), 2),
+            "stdout_bytes": sum(c["stdout_bytes"] or 0 for c in finished),
+        }
+
+def over_budget():
+    """
+    Describe how the finished command went over its git process budget, or None.
+
+    Called when the command ends; GITGUARD_GIT_STRICT=1 makes the CLI exit
+    non-zero on it.
+    """
+    with _lock:
+        if _budget is None or _charged <= _budget:
+            return None
+        charged = [" ".join(c["argv"][1:]) for c in _calls if c.get("charged")]
+    return f"gitguard {_command}: started {len(charged)} git processes, budget is {_budget} ({'; '.join(charged)})"
+
+def _start(argv, charge: bool) -> dict:
+    global _charged
+    record = {"argv": argv, "exit": None, "ms": None, "stdout_bytes": None, "stderr_bytes": None, "charged": charge}
+    with _lock:
+        if charge:
+            _charged += 1
+        _calls.append(record)
+    record["_started"] = time.perf_counter()
+    return record
+
+def _finish(record, returncode, stdout=None, stderr=None):
+    record["ms"] = round((time.perf_counter() - record.pop("_started")) * 1000, 2)
+    record["exit"] = returncode
+    record["stdout_bytes"] = len(stdout) if stdout is not None else None
+    record["stderr_bytes"] = len(stderr) if stderr is not None else None
+    logger.debug(f"git {' '.join(record['argv'][1:])} -> {returncode} in {record['ms']}ms")
+
+def run(args, input=None, env=None, cwd=None, check=True, text=False, timeout=None, charge=True, **kwargs):
+    """
+    Run `git <args>` to completion with output captured, and account for it.
+
+    Args:
+        args: Arguments after "git"
+        input: Data for stdin
+        env: Environment (default: inherited)
+        cwd: Working directory (default: current)
+        check: Raise CalledProcessError on a non-zero exit
+        text: Decode stdin/stdout/stderr as text
+        timeout: Seconds before the process is killed (default: timeout_for(args))
+        charge: Count against the command's budget (False for commands the user asked for)
+
+    Returns:
+        subprocess.CompletedProcess
+
+    Raises:
+        subprocess.CalledProcessError: If check is set and git exits non-zero
+        subprocess.TimeoutExpired: If git runs longer than timeout
+    """
+    argv = ["git", *args]
+    record = _start(argv, charge)
+    try:
+        result = subprocess.run(
+            argv,
+            input=input,
+            env=env,
+            cwd=cwd,
+            capture_output=True,
+            text=text,
+            timeout=timeout or timeout_for(args),
+            **kwargs
+        )
+    except subprocess.TimeoutExpired as e:
+        _finish(record, "timeout", e.stdout, e.stderr)
+        logger.error(f"git {' '.join(args)} timed out after {e.timeout:.0f}s")
+        raise
+    except OSError:
+        _finish(record, "error")
+        raise
+    _finish(record, result.returncode, result.stdout, result.stderr)
+    if check and result.returncode:
+        raise subprocess.CalledProcessError(result.returncode, argv, result.stdout, result.stderr)
+    return result
+
+def output(args, **kwargs) -> str:
+    """Run `git <args>` and return its stripped text stdout (raises on failure)."""
+    return run(args, text=True, **kwargs).stdout.strip()
+
+def popen(args, charge=True, **kwargs) -> subprocess.Popen:
+    """
+    Start `git <args>` for streaming; pair with finished() once it has exited.
+
+    Streaming processes have no timeout: callers read them incrementally and
+    may stop early (e.g. status once the answer is known).
+    """
+    argv = ["git", *args]
+    record = _start(argv, charge)
+    try:
+        proc = subprocess.Popen(argv, **kwargs)
+    except OSError:
+        _finish(record, "error")
+        raise
+    proc.gitguard_record = record
+    return proc
+
+def finished(proc, stdout_bytes: int = None):
+    """Record the exit of a process started with popen()."""
+    record = getattr(proc, "gitguard_record", None)
+    if record is not None and "_started" in record:
+        _finish(record, proc.returncode)
+        record["stdout_bytes"] = stdout_bytes
@@ -0,0 +1,265 @@
+import contextlib
+import json
+import os
+import pathlib
+import logging
+
+from .filelock import lock_fd, unlock_fd
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_NAME = 'checkpoints.log'
+LOCK_NAME = 'checkpoints.lock'
+LEGACY_NAME = 'checkpoints.json'
+
+# Compact once the journal holds this many more records than live checkpoints
+COMPACT_SLACK = 64
+
+def _fsync_dir(path: pathlib.Path):
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class CheckpointJournal:
+    """
+    Append-only, crash-safe record of GitGuard checkpoints.
+
+    Every change is one JSON line appended with a single write() and fsync'd:
+    {"op": "add", "cp": {...}} or {"op": "drop", "ids": [...]}. Each record
+    also carries "head" and "head_at": the id of the newest live checkpoint
+    after that record and the byte offset of its "add" line. Reading the last
+    line of the file is therefore enough to find the latest checkpoint.
+
+    A torn final line (a crash mid-append) is ignored on read and truncated on
+    the next append. Writers serialise on an advisory lock file which is
+    shared by checkpoint creation, rollback and clean.
+    """
+
+    def __init__(self, root=None):
+        self.root = pathlib.Path(root) if root else pathlib.Path('.git') / 'gitguard'
+        self.path = self.root / JOURNAL_NAME
+        self._lock_depth = 0
+
+    # -- locking -------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Hold the exclusive checkpoint lock (re-entrant within this object)."""
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield self
+            finally:
+                self._lock_depth -= 1
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.root / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            lock_fd(fd)
+            self._lock_depth = 1
+            self._migrate_legacy()
+            yield self
+        finally:
+            self._lock_depth = 0
+            try:
+                unlock_fd(fd)
+            finally:
+                os.close(fd)
+
+    # -- reading ---------------------------------------------------------------
+
+    def _records(self):
+        """Yield (offset, record) for every complete, parseable line."""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            offset = 0
+            for line in f:
+                start = offset
+                offset += len(line)
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    yield start, json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt checkpoint journal record at byte {start}")
+
+    def entries(self):
+        """Return live checkpoints, newest first."""
+        live = {}
+        for _, record in self._records():
+            if record.get("op") == "add":
+                live[record["cp"]["id"]] = record["cp"]
+            elif record.get("op") == "drop":
+                for cp_id in record.get("ids", []):
+                    live.pop(cp_id, None)
+        return list(reversed(live.values()))
+
+    def _last_record(self):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            block = 4096
+            tail = b""
+            pos = end
+            while pos > 0:
+                step = min(block, pos)
+                pos -= step
+                f.seek(pos)
+                tail = f.read(step) + tail
+                # Need the newline that ends the last line and the one before it
+                body = tail[:tail.rfind(b"\n")] if b"\n" in tail else b""
+                if b"\n" in body or pos == 0:
+                    break
+            complete = tail[:tail.rfind(b"\n") + 1]
+            lines = complete.splitlines()
+            if not lines:
+                return None
+            try:
+                return json.loads(lines[-1])
+            except json.JSONDecodeError:
+                return None
+
+    def latest(self):
+        """Return the newest live checkpoint, reading only the journal's last line and its target."""
+        if not self.path.exists() and (self.root / LEGACY_NAME).exists():
+            with self.lock():
+                pass  # lock() migrates checkpoints.json
+        record = self._last_record()
+        if record is None:
+            entries = self.entries()
+            return entries[0] if entries else None
+        head_at = record.get("head_at")
+        if head_at is None:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(head_at)
+            try:
+                target = json.loads(f.readline())
+                return target["cp"]
+            except (json.JSONDecodeError, KeyError):
+                entries = self.entries()
+                return entries[0] if entries else None
+
+    def get(self, cp_id):
+        for cp in self.entries():
+            if cp["id"] == cp_id:
+                return cp
+        return None
+
+    # -- writing (callers must hold lock()) -----------------------------------
+
+    def _append(self, record: dict):
+        assert self._lock_depth, "journal writes require lock()"
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            size = os.lseek(fd, 0, os.SEEK_END)
+            if size:
+                os.lseek(fd, size - 1, os.SEEK_SET)
+                if os.read(fd, 1) != b"\n":
+                    size = self._truncate_torn_tail(fd, size)
+            if record.get("head_at") == "self":
+                record["head_at"] = size
+            data = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _truncate_torn_tail(self, fd, size):
+        chunk = 4096
+        pos = size
+        while pos > 0:
+            step = min(chunk, pos)
+            pos -= step
+            os.lseek(fd, pos, os.SEEK_SET)
+            data = os.read(fd, step)
+            idx = data.rfind(b"\n")
+            if idx != -1:
+                new_size = pos + idx + 1
+                break
+        else:
+            new_size = 0
+        logger.warning(f"Truncating torn checkpoint journal tail ({size - new_size} bytes)")
+        os.ftruncate(fd, new_size)
+        return new_size
+
+    def add(self, checkpoint: dict):
+        """Record a new checkpoint; it becomes the latest."""
+        self._append({"op": "add", "cp": checkpoint, "head": checkpoint["id"], "head_at": "self"})
+
+    def drop(self, ids):
+        """Forget checkpoints by id and re-point the head at the newest survivor."""
+        ids = list(ids)
+        if not ids:
+            return
+        live_offsets = {}
+        for offset, record in self._records():
+            if record.get("op") == "add":
+                live_offsets[record["cp"]["id"]] = offset
+            elif record.get("op") == "drop":
+                for cp_id in record.get("ids", []):
+                    live_offsets.pop(cp_id, None)
+        for cp_id in ids:
+            live_offsets.pop(cp_id, None)
+        head, head_at = None, None
+        if live_offsets:
+            head, head_at = max(live_offsets.items(), key=lambda item: item[1])
+        self._append({"op": "drop", "ids": ids, "head": head, "head_at": head_at})
+        self._maybe_compact(len(live_offsets))
+
+    def _maybe_compact(self, live_count: int):
+        records = sum(1 for _ in self._records())
+        if records > live_count + COMPACT_SLACK:
+            self.compact()
+
+    def compact(self, entries=None):
+        """
+        Rewrite the journal with only live checkpoints, atomically and durably.
+
+        Args:
+            entries: Replacement checkpoints, newest first (default: the current live set)
+        """
+        assert self._lock_depth, "journal compaction requires lock()"
+        live = list(reversed(self.entries() if entries is None else entries))
+        tmp = self.path.with_suffix(".log.tmp")
+        offset = 0
+        with open(tmp, 'wb') as f:
+            for cp in live:
+                line = (json.dumps({"op": "add", "cp": cp, "head": cp["id"], "head_at": offset},
+                                   separators=(",", ":")) + "\n").encode("utf-8")
+                f.write(line)
+                offset += len(line)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        _fsync_dir(self.root)
+        logger.info(f"Compacted checkpoint journal to {len(live)} record(s)")
+
+    # -- legacy checkpoints.json ---------------------------------------------
+
+    def _migrate_legacy(self):
+        legacy = self.root / LEGACY_NAME
+        if self.path.exists() or not legacy.exists():
+            return
+        try:
+            with open(legacy) as f:
+                old = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            old = []
+        # Legacy list is newest first; replay oldest first so the newest ends up as head
+        for cp in reversed(old):
+            cp.setdefault("id", cp.get("ref"))
+            self.add(cp)
+        os.replace(legacy, legacy.with_suffix(".json.migrated"))
+        logger.info(f"Migrated {len(old)} checkpoint(s) from {LEGACY_NAME}")
@@ -0,0 +1,113 @@
+import json
+import re
+
+# A \uD800-\uDBFF escape at the end of the text: the first half of a surrogate pair
+_HIGH_SURROGATE_TAIL = re.compile(r"(\\+)u[dD][89abAB][0-9a-fA-F]{2}$")
+
+class PartialJSONParser:
+    """
+    Incremental parser for a JSON object that arrives in pieces.
+
+    feed() scans only the new text and returns the best complete view of the
+    object so far: finished keys with their values, plus the string value that
+    is currently being written (so long text can be rendered as it streams).
+    Half-written keys, numbers and literals are left out until they finish.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        # Stack of [container, expecting] with container "obj"/"arr" and
+        # expecting "key", "colon", "value" or "comma"
+        self._stack = []
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._token_start = None
+        # Longest prefix known to be closable, and the text that closes it
+        self._safe_end = 0
+        self._safe_closers = None
+
+    def _closers(self) -> str:
+        return "".join("}" if kind == "obj" else "]" for kind, _ in reversed(self._stack))
+
+    def _mark_safe(self, end: int):
+        self._safe_end = end
+        self._safe_closers = self._closers()
+
+    def _value_done(self, end: int):
+        if self._stack:
+            self._stack[-1][1] = "comma"
+        self._mark_safe(end)
+
+    def _end_token(self, end: int):
+        if self._token_start is not None:
+            self._token_start = None
+            self._value_done(end)
+
+    def feed(self, text: str):
+        """Add streamed text and return the partial object (or None before it starts)."""
+        start = len(self.buffer)
+        self.buffer += text
+        for i in range(start, len(self.buffer)):
+            self._step(self.buffer[i], i)
+        return self.snapshot()
+
+    def _step(self, ch: str, i: int):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    self._stack[-1][1] = "colon"
+                else:
+                    self._value_done(i + 1)
+            return
+
+        if self._token_start is not None:
+            if ch in " \t\r\n,]}":
+                self._end_token(i)
+            else:
+                return
+
+        if ch in " \t\r\n":
+            return
+        if ch in "{[":
+            self._stack.append(["obj" if ch == "{" else "arr", "key" if ch == "{" else "value"])
+            self._mark_safe(i + 1)
+        elif ch in "}]":
+            if self._stack:
+                self._stack.pop()
+            self._value_done(i + 1)
+        elif ch == '"':
+            self._in_string = True
+            self._string_is_key = bool(self._stack) and self._stack[-1] == ["obj", "key"]
+        elif ch == ":":
+            if self._stack:
+                self._stack[-1][1] = "value"
+        elif ch == ",":
+            if self._stack:
+                self._stack[-1][1] = "key" if self._stack[-1][0] == "obj" else "value"
+        else:
+            self._token_start = i
+
+    def snapshot(self):
+        """Return the current partial object without consuming more input."""
+        if self._in_string and not self._string_is_key:
+            text = self.buffer[:-1] if self._escape else self.buffer
+            match = _HIGH_SURROGATE_TAIL.search(text)
+            if match and len(match.group(1)) % 2:
+                # Wait for the low half rather than expose a lone surrogate
+                text = text[:match.start() + len(match.group(1)) - 1]
+            try:
+                return json.loads(text + '"' + self._closers())
+            except json.JSONDecodeError:
+                pass  # e.g. a half-written \\u escape; fall back to the safe prefix
+        if self._safe_closers is None:
+            return None
+        try:
+            return json.loads(self.buffer[:self._safe_end] + self._safe_closers)
+        except json.JSONDecodeError:
+            return None
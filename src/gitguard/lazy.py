@@ -0,0 +1,34 @@
+import importlib
+
+
+class LazyModule:
+    """Module proxy that defers the real import until an attribute is used."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            from .timing import span
+
+            with span("import", module=self._name):
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "deferred"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Return a proxy for `name` that is only imported on first attribute access.
+
+    Used to keep heavy dependencies (google.genai, GitPython, rich) off the
+    startup path of commands that never touch them.
+    """
+    return LazyModule(name)
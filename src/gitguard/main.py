@@ -1,35 +1,54 @@
 import typer
-from rich import print
-from rich.panel import Panel
-from rich.table import Table
-from rich.console import Console
+import contextlib
 import os
 import sys
+import subprocess
+import time
+import threading
+from concurrent.futures import Future
+from typing import List, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
 from datetime import datetime
 
-from .gemini import (
-    get_git_plan, 
-    get_fix_plan, 
-    generate_commit_message, 
-    audit_code, 
-    explain_changes,
-    explain_command
+from .lazy import lazy_import
+from .ui import (
+    print,
+    get_console,
+    status as spinner,
+    confirm,
+    prompt,
+    emit,
+    machine_output,
+    set_output_mode,
+    finish_output,
+    OUTPUT_MODES
 )
 from .git_ops import (
     create_checkpoint, 
     run_git_commands, 
     rollback_last, 
+    rollback_to,
+    list_checkpoints,
     is_git_repo, 
-    get_staged_diff,
-    get_diff,
-    list_backup_branches,
-    delete_branch,
+    get_staged_tree,
+    list_checkpoint_refs,
+    count_checkpoints,
+    migrate_backup_branches,
+    delete_checkpoints,
     gather_context,
     sanitize_git_input
 )
+from .planner import match_intent, load_stats
+from . import gitexec, timing
+from .timing import span
+from .diffpack import pack_diff
+from .audit import staged_changes, run_audit
+
+# google.genai and pydantic are only needed by the AI-backed commands,
+# so keep them off the startup path of status/clean/rollback.
+gemini = lazy_import(f"{__package__}.gemini")
 
 load_dotenv()
 
@@ -52,8 +71,59 @@ def setup_logging():
 setup_logging()
 logger = logging.getLogger(__name__)
 
-app = typer.Typer(help="GitGuard: AI-Powered Git Safety Copilot for Learning")
-console = Console()
+# Plain click help: rendering it with rich would import rich for every --help
+app = typer.Typer(help="GitGuard: AI-Powered Git Safety Copilot for Learning", rich_markup_mode=None)
+
+@app.callback()
+def main_options(
+    ctx: typer.Context,
+    # show_default=False: typer imports rich just to escape a "[default: ...]" suffix
+    output: str = typer.Option("text", "--output", "-o", show_default=False, help="Output format: text (default), json (one object at exit) or ndjson (one event per line)"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Answer yes to every confirmation prompt"),
+    profile: bool = typer.Option(False, "--profile", help="Print how long each phase took and save it under ~/.gitguard/logs")
+):
+    """
+    GitGuard: AI-Powered Git Safety Copilot for Learning
+    """
+    if output not in OUTPUT_MODES:
+        raise typer.BadParameter(f"must be one of: {', '.join(OUTPUT_MODES)}", param_hint="--output")
+    set_output_mode(output, assume_yes=yes)
+    # Closed last-in first-out: the command span ends, then the profile is reported, then output flushed
+    ctx.call_on_close(finish_output)
+    gitexec.begin(ctx.invoked_subcommand)
+    ctx.call_on_close(check_git_budget)
+    ctx.call_on_close(lambda: logger.info(f"git processes: {gitexec.summary()}"))
+    timing.enable(profile)
+    if profile:
+        command = ctx.invoked_subcommand
+        ctx.call_on_close(lambda: report_profile(command))
+        ctx.with_resource(span(f"command.{command}"))
+
+def check_git_budget():
+    """Once a command has finished, flag it if it started more git processes than its budget."""
+    problem = gitexec.over_budget()
+    if not problem:
+        return
+    logger.warning(problem)
+    if gitexec.strict():
+        sys.stderr.write(f"Git process budget exceeded: {problem}\n")
+        raise typer.Exit(3)
+
+def report_profile(command: str):
+    """Show the recorded spans and write them to ~/.gitguard/logs."""
+    spans = timing.records()
+    path = timing.write_report(command, git=gitexec.calls())
+    timing.enable(False)
+    if machine_output():
+        emit("profile", {"spans": spans, "file": str(path) if path else None})
+        return
+    from rich.markup import escape
+
+    print("\n[bold]Profile:[/bold]")
+    for line in timing.format_report(spans):
+        print(escape(line))
+    if path:
+        print(f"[dim]Saved to {path}[/dim]")
 
 def get_risk_color(risk: str):
     risk = risk.upper()
@@ -62,30 +132,141 @@ def get_risk_color(risk: str):
     if risk == "HIGH": return "red"
     return "white"
 
-def display_plan(plan):
-    """Display execution plan with beautiful formatting."""
-    risk_color = get_risk_color(plan['risk'])
+def render_plan(plan):
+    """Build the plan panel; tolerates a partial plan that is still streaming in."""
+    from rich.markup import escape
+    from rich.panel import Panel
+
+    risk = str(plan.get('risk') or "").upper()
+    risk_color = get_risk_color(risk)
     
     plan_text = f"[bold]Interpreted Action:[/bold]\n"
-    plan_text += f"• {plan['summary']}\n\n"
-    plan_text += f"[bold]Risk Level:[/bold] [{risk_color}]{plan['risk'].upper()}[/{risk_color}]\n\n"
+    plan_text += f"• {escape(plan.get('summary') or '')}\n\n"
+    plan_text += f"[bold]Risk Level:[/bold] [{risk_color}]{escape(risk)}[/{risk_color}]\n\n"
     
     if plan.get('explanation'):
-        plan_text += f"[bold cyan]💡 Learning Note:[/bold cyan]\n{plan['explanation']}\n\n"
+        plan_text += f"[bold cyan]💡 Learning Note:[/bold cyan]\n{escape(plan['explanation'])}\n\n"
     
     plan_text += f"[bold]Planned Commands:[/bold]\n"
-    for i, cmd in enumerate(plan['commands'], 1):
-        plan_text += f"  {i}. [cyan]{cmd}[/cyan]\n"
-
-    print(
-        Panel(
-            plan_text,
-            title="[bold]Proposed Execution Plan[/bold]",
-            border_style=risk_color,
-            padding=(1, 2)
-        )
+    for i, cmd in enumerate(plan.get('commands') or [], 1):
+        plan_text += f"  {i}. [cyan]{escape(cmd)}[/cyan]\n"
+
+    return Panel(
+        plan_text,
+        title="[bold]Proposed Execution Plan[/bold]",
+        border_style=risk_color,
+        padding=(1, 2)
+    )
+
+def display_plan(plan, event: str = "plan"):
+    """Display execution plan with beautiful formatting."""
+    if machine_output():
+        emit(event, plan, many=event != "plan")
+        return
+    print(render_plan(plan))
+
+def render_explanation(expl):
+    from rich.markup import escape
+    from rich.panel import Panel
+
+    key_changes_text = "\n".join(f"• {escape(k)}" for k in expl.get('key_changes') or [])
+    return Panel(
+        f"{escape(expl.get('summary') or '')}\n\n[bold cyan]Key Changes:[/bold cyan]\n{key_changes_text}",
+        title="[bold]Plain English Explanation[/bold]",
+        border_style="blue",
+        padding=(1, 2)
+    )
+
+def render_command_explanation(explanation):
+    from rich.markup import escape
+    from rich.panel import Panel
+
+    return Panel(
+        f"[bold]What it does:[/bold]\n{escape(explanation.get('what_it_does') or '')}\n\n"
+        f"[bold cyan]Common use cases:[/bold cyan]\n" + 
+        "\n".join(f"• {escape(uc)}" for uc in explanation.get('use_cases') or []) + "\n\n"
+        f"[bold yellow]⚠️  Potential risks:[/bold yellow]\n{escape(explanation.get('risks') or '')}\n\n"
+        f"[bold green]Related commands to learn:[/bold green]\n" +
+        "\n".join(f"• {escape(rc)}" for rc in explanation.get('related_commands') or []),
+        title="[bold]Command Explanation[/bold]",
+        border_style="blue",
+        padding=(1, 2)
     )
 
+@contextlib.contextmanager
+def streaming_panel(render, status_text: str):
+    """
+    Show a spinner, then re-render the response panel as streamed fields arrive.
+
+    Yields the on_update callback for the gemini call, or None when output is
+    not a terminal (the call then blocks behind a plain spinner as before).
+    The live view is transient; callers print the final panel themselves.
+    In json/ndjson output mode there is no spinner and no callback.
+    """
+    if machine_output():
+        yield None
+        return
+    console = get_console()
+    if not console.is_terminal:
+        with console.status(status_text, spinner="dots"):
+            yield None
+        return
+
+    from rich.live import Live
+    from rich.spinner import Spinner
+
+    with Live(Spinner("dots", text=status_text), console=console, transient=True, refresh_per_second=12) as live:
+        yield lambda partial: live.update(render(partial))
+
+# Context fields a fix requested before the post-failure context is known depends
+# on. The plan's own commits or stashes flip has_uncommitted before a push fails
+# without changing how to fix it.
+SPECULATION_CONTEXT_KEYS = ("branch", "remotes")
+
+def _background(fn, *args):
+    """
+    Run fn in a daemon thread and return a Future for its result.
+
+    Daemon threads (rather than an executor) so an unused speculative request
+    never holds up process exit.
+    """
+    future = Future()
+
+    def target():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, daemon=True).start()
+    return future
+
+def _fix_context_changed(old: dict, new: dict) -> bool:
+    return any((old or {}).get(k) != (new or {}).get(k) for k in SPECULATION_CONTEXT_KEYS)
+
+def _predict_failure(commands, context):
+    """
+    Guess the most likely failure of a command list before it runs.
+
+    Currently only a bare `git push` on a branch without an upstream, which
+    git always rejects. Disabled with GITGUARD_NO_SPECULATE.
+
+    Returns:
+        (error_message, stderr_marker) or None
+    """
+    if os.getenv("GITGUARD_NO_SPECULATE") or context.get("upstream") or context.get("detached"):
+        return None
+    if not context.get("remotes"):
+        return None
+    for cmd in commands:
+        if cmd.split() == ["git", "push"]:
+            branch = context.get("branch")
+            return (
+                f"fatal: The current branch {branch} has no upstream branch.",
+                "has no upstream branch"
+            )
+    return None
+
 @app.command()
 def run(
     intent: str = typer.Argument(..., help="What do you want to do? (e.g. 'undo last commit')"),
@@ -112,9 +293,14 @@ def run(
     context = gather_context()
     logger.info(f"Context: {context}")
 
-    # Get AI plan
-    with console.status("[bold blue]Thinking...", spinner="dots"):
-        plan = get_git_plan(intent, context)
+    # Common intents are planned locally; only fall back to the AI on a miss
+    with span("plan") as s:
+        plan = match_intent(intent, context)
+        s.set(source="local")
+        if plan is None:
+            s.set(source="ai")
+            with streaming_panel(render_plan, "[bold blue]Thinking...") as on_update:
+                plan = gemini.get_git_plan(intent, context, on_update=on_update)
     
     if not plan.get("commands"):
         print("[red]Could not determine any commands to run.[/red]")
@@ -124,7 +310,7 @@ def run(
     # Handle missing info prompt from initial plan
     if plan.get('missing_info_prompt'):
         print(f"\n[bold cyan]Input Required:[/bold cyan] {plan['missing_info_prompt']}")
-        user_input = typer.prompt("Value")
+        user_input = prompt("Value")
         
         # Determine input type from prompt
         input_type = "general"
@@ -148,12 +334,13 @@ def run(
     
     # Dry run mode
     if dry_run:
+        emit("result", {"success": None, "dry_run": True, "commands": plan['commands']})
         print("\n[yellow]Dry run mode - no changes made[/yellow]")
         print("[dim]Remove --dry-run flag to execute these commands[/dim]")
         return
     
     # Confirm and execute with retry logic
-    if force or typer.confirm("\nProceed with this plan?", default=False):
+    if force or confirm("\nProceed with this plan?", default=False):
         
         # Create checkpoint ONCE before starting (if MEDIUM or HIGH risk)
         checkpoint = None
@@ -161,8 +348,17 @@ def run(
             try:
                 checkpoint = create_checkpoint()
             except Exception as e:
-                logger.warning(f"Checkpoint creation failed: {e}")
-                print(f"[yellow]Warning: Checkpoint failed ({e}), proceeding anyway...[/yellow]")
+                detail = getattr(e, "stderr", None) or str(e)
+                if isinstance(detail, bytes):
+                    detail = detail.decode("utf-8", "replace")
+                detail = detail.strip()
+                print(f"[bold red]Could not create a checkpoint:[/bold red] {detail}")
+                # Not `force`: only an explicit answer (or --yes) may run a risky plan unprotected
+                if not confirm(f"Run this {plan['risk'].upper()} risk plan without a checkpoint?", default=False):
+                    emit("result", {"success": False, "checkpoint_failed": True, "commands": []})
+                    print("[yellow]Cancelled. No changes made to your repository.[/yellow]")
+                    raise typer.Exit(1)
+                logger.warning("Proceeding without a checkpoint at the user's request")
 
         current_commands = plan['commands']
         attempt = 0
@@ -179,9 +375,20 @@ def run(
                 break
             seen_command_sets.add(cmd_signature)
             
+            # While a bare push runs, ask for the likely fix in the background
+            prediction = _predict_failure(current_commands, context)
+            speculative_fix = None
+            if prediction:
+                logger.info(f"Speculatively requesting fix for: {prediction[0]}")
+                speculative_fix = _background(
+                    gemini.get_fix_plan, intent, current_commands, prediction[0], list(command_history), context
+                )
+
             try:
-                run_git_commands(current_commands)
+                with span("execute", attempt=attempt + 1, commands=len(current_commands)):
+                    run_git_commands(current_commands)
                 command_history.extend(current_commands)
+                emit("result", {"success": True, "attempts": attempt + 1, "commands": command_history, "checkpoint": checkpoint})
                 print(f"\n[bold green]✅ Success![/bold green] Operation completed safely.")
                 if checkpoint:
                     print(f"[dim]Undo anytime with: gitguard rollback[/dim]")
@@ -202,9 +409,25 @@ def run(
 
                 print("\n[bold yellow]Consulting AI for a fix...[/bold yellow]")
                 
-                with console.status("[bold yellow]Analyzing error...", spinner="dots"):
-                    context = gather_context()  # Re-gather in case state changed
-                    fix_plan = get_fix_plan(intent, current_commands, str(e), command_history, context)
+                with spinner("[bold yellow]Analyzing error..."), span("fix", attempt=attempt) as s:
+                    stderr = getattr(e, "stderr", None) or ""
+                    if speculative_fix and prediction[1] in stderr:
+                        logger.info("Using speculatively requested fix")
+                        s.set(speculative=True)
+                        pending_fix = speculative_fix
+                    else:
+                        # Ask with the pre-failure context while the new one is gathered
+                        pending_fix = _background(
+                            gemini.get_fix_plan, intent, current_commands, str(e), list(command_history), context
+                        )
+                    fresh = gather_context()
+                    if _fix_context_changed(context, fresh):
+                        logger.info("Context changed during the failure; re-requesting fix")
+                        s.set(reissued=True)
+                        fix_plan = gemini.get_fix_plan(intent, current_commands, str(e), command_history, fresh)
+                    else:
+                        fix_plan = pending_fix.result()
+                    context = fresh
                 
                 if not fix_plan or not fix_plan.get('commands'):
                     print("[red]AI could not determine a fix.[/red]")
@@ -216,7 +439,7 @@ def run(
                 # Handle missing info in fix
                 if fix_plan.get('missing_info_prompt'):
                     print(f"\n[bold cyan]Input Required:[/bold cyan] {fix_plan['missing_info_prompt']}")
-                    user_input = typer.prompt("Value")
+                    user_input = prompt("Value")
                     
                     input_type = "general"
                     if "url" in fix_plan['missing_info_prompt'].lower():
@@ -235,9 +458,9 @@ def run(
                         break
 
                 print("\n[bold]AI Suggested Fix:[/bold]")
-                display_plan(fix_plan)
+                display_plan(fix_plan, event="fix")
 
-                if force or typer.confirm("\nApply this fix?", default=True):
+                if force or confirm("\nApply this fix?", default=True):
                     command_history.extend(current_commands)
                     current_commands = fix_plan['commands']
                 else:
@@ -246,25 +469,65 @@ def run(
                         print(f"[dim]You can rollback with: gitguard rollback[/dim]")
                     break
 
+        emit("result", {"success": False, "attempts": attempt, "commands": command_history, "checkpoint": checkpoint})
+
         # If we broke out of the loop due to failure, offer rollback
         if attempt >= max_retries and checkpoint:
-            if typer.confirm("\nWould you like to rollback to the checkpoint?", default=True):
+            if confirm("\nWould you like to rollback to the checkpoint?", default=True):
                 rollback_last()
     else:
+        emit("result", {"success": None, "cancelled": True, "commands": []})
         print("\n[yellow]Cancelled. No changes made to your repository.[/yellow]")
 
 @app.command()
-def rollback():
+def rollback(
+    to: str = typer.Option(None, "--to", help="Checkpoint id, or a time such as '2025-12-30 14:00' (newest checkpoint at or before it)"),
+    list_checkpoints_: bool = typer.Option(False, "--list", "-l", help="List checkpoints and exit"),
+    paths: Optional[List[str]] = typer.Argument(None, help="Only restore these paths (after --)")
+):
     """
     Undo the last GitGuard operation using safety checkpoints.
     
     This will revert your repository to the state before the last
-    risky operation was performed.
+    risky operation was performed. Use --to to pick an older checkpoint
+    and pass paths after -- to restore just those files.
     """
     if not is_git_repo():
         print("[bold red]Error:[/bold red] Not a git repository.")
         raise typer.Exit(1)
-    rollback_last()
+
+    if list_checkpoints_:
+        checkpoints = list_checkpoints()
+        if not checkpoints:
+            print("[yellow]No checkpoints available for rollback.[/yellow]")
+            emit("checkpoints", [])
+            return
+        if machine_output():
+            emit("checkpoints", checkpoints)
+            return
+
+        from rich.table import Table
+
+        table = Table(title="GitGuard Checkpoints")
+        table.add_column("ID", style="cyan")
+        table.add_column("Created")
+        table.add_column("HEAD", style="dim")
+        table.add_column("Contents")
+        for cp in checkpoints:
+            created = datetime.strptime(cp['created'], "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+            head = (cp.get('head') or "")[:7]
+            if cp.get('worktree_tree'):
+                contents = "HEAD, index, worktree"
+            else:
+                contents = "commit + stash" if cp.get('stash') else "commit"
+            table.add_row(cp['id'], created, head, contents)
+        print(table)
+        return
+
+    if to is None and not paths:
+        rollback_last()
+    else:
+        rollback_to(to, paths)
 
 @app.command()
 def commit():
@@ -278,7 +541,9 @@ def commit():
         print("[bold red]Error:[/bold red] Not a git repository.")
         raise typer.Exit(1)
 
-    diff = get_staged_diff()
+    with span("diff", staged=True) as s:
+        diff = pack_diff(["--cached"])
+        s.set(bytes=len(diff or ""))
     if not diff:
         print("[yellow]No staged changes found.[/yellow]")
         print("[dim]Stage your files first: git add <files>[/dim]")
@@ -286,28 +551,33 @@ def commit():
 
     print("[bold blue]Generating commit message...[/bold blue]")
     
-    with console.status("[bold blue]Analyzing changes...", spinner="dots"):
-        msg = generate_commit_message(diff)
+    with spinner("[bold blue]Analyzing changes..."):
+        msg = gemini.generate_commit_message(diff, get_staged_tree())
     
     if not msg:
         print("[red]Failed to generate message.[/red]")
         return
 
+    emit("commit_message", msg)
     print(f"\n[bold green]Subject:[/bold green] {msg['subject']}")
     print(f"[bold green]Body:[/bold green]\n{msg['body']}")
     
-    if typer.confirm("\nCommit with this message?", default=True):
+    if confirm("\nCommit with this message?", default=True):
         full_msg = f"{msg['subject']}\n\n{msg['body']}"
         # Escape quotes for shell
         full_msg = full_msg.replace('"', '\\"')
         run_git_commands([f'git commit -m "{full_msg}"'])
+        emit("committed", True)
         print("[green]✓ Committed successfully![/green]")
     else:
         print("[yellow]Commit cancelled.[/yellow]")
         print("[dim]You can commit manually with: git commit[/dim]")
 
 @app.command()
-def audit():
+def audit(
+    concurrency: int = typer.Option(None, "--concurrency", "-j", help="Parallel AI requests for large diffs (default: $GITGUARD_AUDIT_CONCURRENCY or 4)"),
+    local_only: bool = typer.Option(False, "--local-only", help="Only run the local secret/debug scanner; nothing is sent to the AI")
+):
     """
     Audit staged code for potential issues before committing.
     
@@ -321,21 +591,30 @@ def audit():
         print("[bold red]Error:[/bold red] Not a git repository.")
         raise typer.Exit(1)
 
-    diff = get_staged_diff()
-    if not diff:
+    changes = staged_changes()
+    if not changes:
         print("[yellow]No staged changes to audit.[/yellow]")
         print("[dim]Stage your files first: git add <files>[/dim]")
         return
 
-    print("[bold blue]Auditing code...[/bold blue]")
-    
-    with console.status("[bold blue]Scanning for issues...", spinner="dots"):
-        result = audit_code(diff)
-    
-    if not result:
-        print("[red]Audit failed.[/red]")
+    # Secrets, debug statements and TODOs are found locally over every added line;
+    # the AI sees the rest with secrets masked. Unchanged files re-use earlier results.
+    print(f"[bold blue]Auditing code...[/bold blue] [dim]({len(changes)} file(s))[/dim]")
+    with spinner("[bold blue]Scanning for issues..."), span("audit", files=len(changes)) as s:
+        result, stats = run_audit(changes, local_only, concurrency)
+        s.set(**stats)
+
+    if stats["cached"]:
+        print(f"[dim]Re-used results for {stats['cached']} unchanged file(s); audited {stats['audited']}.[/dim]")
+    if stats["ai_unavailable"]:
+        print("[yellow]AI audit unavailable; showing local scan results only.[/yellow]")
+
+    if machine_output():
+        emit("audit", {**result, "stats": stats})
         return
 
+    from rich.panel import Panel
+
     color = "green" if result['passed'] else "red"
     
     if result['issues']:
@@ -357,43 +636,84 @@ def audit():
         print("\n[bold green]✓ Code looks good![/bold green]")
 
 @app.command()
-def clean():
+def clean(
+    dry_run: bool = typer.Option(False, "--dry-run", "-n", help="List what would be deleted without deleting it")
+):
     """
-    Cleanup old GitGuard checkpoint branches.
+    Cleanup old GitGuard checkpoints.
     
-    This removes backup branches created by GitGuard to free up space.
+    This removes checkpoint refs created by GitGuard to free up space.
+    All refs are deleted together in one transaction.
     """
     if not is_git_repo():
         print("[bold red]Error:[/bold red] Not a git repository.")
         raise typer.Exit(1)
         
-    branches = list_backup_branches()
-    if not branches:
+    started = time.perf_counter()
+    refs = list_checkpoint_refs()
+    list_time = time.perf_counter() - started
+    if not refs:
         print("[green]No checkpoints found. Everything is clean! ✓[/green]")
+        emit("clean", {"checkpoints": [], "deleted": 0, "dry_run": dry_run})
         return
 
-    table = Table(title="GitGuard Checkpoints")
-    table.add_column("#", style="dim")
-    table.add_column("Branch Name", style="cyan")
-    
-    for i, b in enumerate(branches, 1):
-        table.add_row(str(i), b)
+    if not machine_output():
+        from rich.table import Table
+
+        table = Table(title="GitGuard Checkpoints")
+        table.add_column("#", style="dim")
+        table.add_column("Ref", style="cyan")
+        
+        for i, ref in enumerate(refs, 1):
+            table.add_row(str(i), ref)
+        
+        print(table)
+    print(f"\n[yellow]Total: {len(refs)} checkpoint(s)[/yellow] [dim](listed in {list_time:.2f}s)[/dim]")
+
+    if dry_run:
+        print(f"[blue]Dry run:[/blue] would delete {len(refs)} checkpoint(s). Nothing was changed.")
+        emit("clean", {"checkpoints": list(refs), "deleted": 0, "dry_run": True})
+        return
     
-    print(table)
-    print(f"\n[yellow]Total: {len(branches)} checkpoint(s)[/yellow]")
-    
-    if typer.confirm(f"Delete all {len(branches)} checkpoint branches?", default=False):
-        deleted = 0
-        for b in branches:
-            if delete_branch(b):
-                print(f"[green]✓ Deleted {b}[/green]")
-                deleted += 1
-            else:
-                print(f"[red]✗ Failed to delete {b}[/red]")
-        print(f"\n[green]Cleaned up {deleted}/{len(branches)} checkpoints.[/green]")
+    if confirm(f"Delete all {len(refs)} checkpoints?", default=False):
+        started = time.perf_counter()
+        try:
+            deleted = delete_checkpoints(refs)
+        except subprocess.CalledProcessError as e:
+            print(f"[red]✗ Failed to delete checkpoints; nothing was removed.[/red]")
+            if e.stderr:
+                print(f"[red]{e.stderr.strip()}[/red]")
+            raise typer.Exit(1)
+        elapsed = time.perf_counter() - started
+        emit("clean", {"checkpoints": list(refs), "deleted": len(deleted), "dry_run": False, "seconds": round(elapsed, 3)})
+        print(f"\n[green]Cleaned up {len(deleted)} checkpoints in {elapsed:.2f}s.[/green]")
     else:
+        emit("clean", {"checkpoints": list(refs), "deleted": 0, "dry_run": False})
         print("[yellow]Cancelled.[/yellow]")
 
+@app.command()
+def migrate():
+    """
+    Move old gitguard-backup-* branches into hidden checkpoint refs.
+    
+    Earlier versions stored checkpoints as branches, which cluttered
+    `git branch`. Rollback keeps working for migrated checkpoints.
+    """
+    if not is_git_repo():
+        print("[bold red]Error:[/bold red] Not a git repository.")
+        raise typer.Exit(1)
+
+    try:
+        moved = migrate_backup_branches()
+    except subprocess.CalledProcessError as e:
+        print(f"[bold red]Migration failed:[/bold red] {e.stderr.strip() if e.stderr else e}")
+        raise typer.Exit(1)
+    emit("migrate", {"migrated": moved})
+    if moved:
+        print(f"[green]✓ Migrated {moved} backup branch(es) to refs/gitguard/checkpoints/[/green]")
+    else:
+        print("[green]No backup branches to migrate. ✓[/green]")
+
 @app.command()
 def explain():
     """
@@ -406,7 +726,9 @@ def explain():
         print("[bold red]Error:[/bold red] Not a git repository.")
         raise typer.Exit(1)
 
-    diff = get_diff()
+    with span("diff") as s:
+        diff = pack_diff(["HEAD"])
+        s.set(bytes=len(diff or ""))
     if not diff:
         print("[yellow]No changes found to explain.[/yellow]")
         print("[dim]Make some changes first, then try again.[/dim]")
@@ -414,21 +736,17 @@ def explain():
 
     print("[bold blue]Analyzing changes...[/bold blue]")
     
-    with console.status("[bold blue]Reading diff...", spinner="dots"):
-        expl = explain_changes(diff)
+    with streaming_panel(render_explanation, "[bold blue]Reading diff...") as on_update:
+        expl = gemini.explain_changes(diff, on_update=on_update)
     
     if not expl:
         print("[red]Failed to explain.[/red]")
         return
 
-    key_changes_text = "\n".join(f"• {k}" for k in expl['key_changes'])
-    
-    print(Panel(
-        f"{expl['summary']}\n\n[bold cyan]Key Changes:[/bold cyan]\n{key_changes_text}",
-        title="[bold]Plain English Explanation[/bold]",
-        border_style="blue",
-        padding=(1, 2)
-    ))
+    if machine_output():
+        emit("explanation", expl)
+        return
+    print(render_explanation(expl))
 
 @app.command()
 def learn(command: str = typer.Argument(..., help="Git command to learn about")):
@@ -441,25 +759,18 @@ def learn(command: str = typer.Argument(..., help="Git command to learn about"))
     """
     print(f"[bold blue]Learning about:[/bold blue] [cyan]{command}[/cyan]\n")
     
-    with console.status("[bold blue]Fetching explanation...", spinner="dots"):
-        explanation = explain_command(command)
+    with streaming_panel(render_command_explanation, "[bold blue]Fetching explanation...") as on_update:
+        explanation = gemini.explain_command(command, on_update=on_update)
     
     if not explanation:
         print("[red]Failed to get explanation.[/red]")
         return
     
+    if machine_output():
+        emit("explanation", explanation)
+        return
     # Display structured explanation
-    print(Panel(
-        f"[bold]What it does:[/bold]\n{explanation['what_it_does']}\n\n"
-        f"[bold cyan]Common use cases:[/bold cyan]\n" + 
-        "\n".join(f"• {uc}" for uc in explanation['use_cases']) + "\n\n"
-        f"[bold yellow]⚠️  Potential risks:[/bold yellow]\n{explanation['risks']}\n\n"
-        f"[bold green]Related commands to learn:[/bold green]\n" +
-        "\n".join(f"• {rc}" for rc in explanation['related_commands']),
-        title="[bold]Command Explanation[/bold]",
-        border_style="blue",
-        padding=(1, 2)
-    ))
+    print(render_command_explanation(explanation))
 
 @app.command()
 def status():
@@ -471,8 +782,15 @@ def status():
         raise typer.Exit(1)
     
     context = gather_context()
-    checkpoints = list_backup_branches()
-    
+    checkpoints = count_checkpoints()
+    stats = load_stats()
+
+    if machine_output():
+        emit("status", {"context": context, "checkpoints": checkpoints, "planner": stats})
+        return
+
+    from rich.table import Table
+
     table = Table(title="GitGuard Status", show_header=False)
     table.add_column("Property", style="cyan")
     table.add_column("Value", style="white")
@@ -490,9 +808,59 @@ def status():
             sync_status.append(f"{context['behind']} behind")
         table.add_row("Sync Status", ", ".join(sync_status))
     
-    table.add_row("Checkpoints", str(len(checkpoints)))
+    table.add_row("Checkpoints", str(checkpoints))
+
+    total = stats["hits"] + stats["misses"]
+    if total:
+        table.add_row("Fast Planner Hits", f"{stats['hits']}/{total} ({stats['hits'] * 100 // total}%)")
     
     print(table)
 
+daemon_app = typer.Typer(help="Manage the optional background daemon that keeps GitGuard warm.", rich_markup_mode=None)
+app.add_typer(daemon_app, name="daemon")
+
+@daemon_app.command("start")
+def daemon_start():
+    """
+    Start the background daemon.
+    
+    While it runs, `gitguard` commands are forwarded to it and skip Python
+    startup, imports and repository re-scans.
+    """
+    from . import daemon
+
+    if not daemon.supported():
+        print("[bold red]Error:[/bold red] The daemon needs Unix domain sockets, which this platform lacks.")
+        raise typer.Exit(1)
+    if daemon.start():
+        print(f"[green]✓ Daemon running[/green] [dim]({daemon.SOCKET_PATH})[/dim]")
+    else:
+        print("[bold red]Error:[/bold red] Daemon did not start; see ~/.gitguard/logs.")
+        raise typer.Exit(1)
+
+@daemon_app.command("stop")
+def daemon_stop():
+    """Stop the background daemon."""
+    from . import daemon
+
+    reply = daemon.request({"op": "stop"})
+    if reply and reply.get("busy"):
+        print("[green]✓ Daemon stopping[/green] [dim](after the command it is running finishes)[/dim]")
+    elif reply:
+        print("[green]✓ Daemon stopped[/green]")
+    else:
+        print("[yellow]Daemon is not running.[/yellow]")
+
+@daemon_app.command("status")
+def daemon_status():
+    """Show whether the background daemon is running."""
+    from . import daemon
+
+    reply = daemon.request({"op": "ping"})
+    if reply:
+        print(f"[green]Daemon running[/green] (pid {reply.get('pid')}, socket {daemon.SOCKET_PATH})")
+    else:
+        print("[yellow]Daemon is not running.[/yellow]")
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
@@ -0,0 +1,313 @@
+import atexit
+import json
+import os
+import pathlib
+import re
+import threading
+import logging
+
+from .filelock import locked
+from .git_ops import sanitize_git_input
+
+logger = logging.getLogger(__name__)
+
+STATS_FILE = pathlib.Path.home() / '.gitguard' / 'planner_stats.json'
+STATS_LOCK = STATS_FILE.with_suffix('.lock')
+
+# Hits and misses not yet written to STATS_FILE; flushed at exit (and by the
+# daemon after each request) so matching an intent does no file I/O
+_pending = {"hits": 0, "misses": 0, "rules": {}}
+_pending_lock = threading.Lock()
+_flush_registered = False
+
+_FILLER = re.compile(r"^(please\s+|can\s+you\s+|could\s+you\s+|i\s+want\s+to\s+|help\s+me\s+)+", re.IGNORECASE)
+
+def _normalize(intent: str) -> str:
+    text = " ".join(intent.split())
+    text = text.rstrip(" .!?")
+    return _FILLER.sub("", text)
+
+def _plan(risk, summary, commands, explanation):
+    return {
+        "risk": risk,
+        "summary": summary,
+        "commands": commands,
+        "missing_info_prompt": None,
+        "explanation": explanation
+    }
+
+def _branch_slot(name: str):
+    try:
+        return sanitize_git_input(name.strip("'\""), "branch")
+    except ValueError:
+        return None
+
+def _current_branch(context):
+    if context.get("detached"):
+        return None
+    return context.get("branch")
+
+# -- rule builders ---------------------------------------------------------
+# Each builder gets the regex match and the gather_context() dict and returns a
+# plan dict, or None when the intent matched but needs the AI to resolve it.
+
+def _undo_commit_keep(match, context):
+    return _plan(
+        "MEDIUM",
+        "Undo the last commit but keep its changes staged",
+        ["git reset --soft HEAD~1"],
+        "reset --soft moves the branch back one commit and leaves the files and index untouched."
+    )
+
+def _undo_commit_discard(match, context):
+    return _plan(
+        "HIGH",
+        "Undo the last commit and discard its changes",
+        ["git reset --hard HEAD~1"],
+        "reset --hard moves the branch back one commit and overwrites your files to match it."
+    )
+
+def _push(match, context):
+    branch = _current_branch(context)
+    remotes = context.get("remotes") or []
+    if not branch or not remotes:
+        return None
+    if context.get("upstream"):
+        return _plan(
+            "MEDIUM",
+            f"Push local '{branch}' to its upstream {context['upstream']}",
+            ["git push"],
+            "Pushing sends your local commits to the remote so others can see them."
+        )
+    remote = "origin" if "origin" in remotes else remotes[0]
+    return _plan(
+        "MEDIUM",
+        f"Push local '{branch}' to '{remote}' and set it as upstream",
+        [f"git push -u {remote} {branch}"],
+        "-u records the remote branch as upstream, so later pushes and pulls need no arguments."
+    )
+
+def _pull(match, context):
+    if not _current_branch(context) or not context.get("upstream"):
+        return None
+    return _plan(
+        "MEDIUM",
+        f"Pull new commits from {context['upstream']}",
+        ["git pull"],
+        "pull fetches the upstream branch and merges it into your current branch."
+    )
+
+def _fetch(match, context):
+    if not context.get("remotes"):
+        return None
+    return _plan(
+        "LOW",
+        "Download new commits and branches from all remotes",
+        ["git fetch --all --prune"],
+        "fetch updates remote-tracking branches without touching your own branches or files."
+    )
+
+def _create_branch(match, context):
+    name = _branch_slot(match.group("name"))
+    if not name or name in (context.get("all_branches") or []):
+        return None
+    return _plan(
+        "MEDIUM",
+        f"Create a new branch '{name}' and switch to it",
+        [f"git checkout -b {name}"],
+        "checkout -b creates a branch at your current commit and switches to it in one step."
+    )
+
+def _switch_branch(match, context):
+    name = _branch_slot(match.group("name"))
+    if not name or name not in (context.get("all_branches") or []):
+        return None
+    return _plan(
+        "MEDIUM",
+        f"Switch to branch '{name}'",
+        [f"git checkout {name}"],
+        "checkout updates your files to match the branch and makes it the current branch."
+    )
+
+def _delete_branch(match, context):
+    name = _branch_slot(match.group("name"))
+    if not name or name == _current_branch(context) or name not in (context.get("all_branches") or []):
+        return None
+    return _plan(
+        "HIGH",
+        f"Delete local branch '{name}'",
+        [f"git branch -D {name}"],
+        "branch -D deletes the branch even if its commits are not merged anywhere else."
+    )
+
+def _delete_all_except(match, context):
+    keep = set()
+    for part in re.split(r",|\band\b", match.group("keep")):
+        name = _branch_slot(part.strip())
+        if not name:
+            return None
+        keep.add(name)
+    branches = context.get("all_branches") or []
+    current = _current_branch(context)
+    if not branches or not keep.issubset(branches) or current not in keep:
+        # Cannot delete the checked-out branch; let the AI explain what to do
+        return None
+    doomed = [b for b in branches if b not in keep]
+    if not doomed:
+        return None
+    return _plan(
+        "HIGH",
+        f"Delete all local branches except {', '.join(sorted(keep))}",
+        [f"git branch -D {b}" for b in doomed],
+        "branch -D deletes each branch even if its commits are not merged anywhere else."
+    )
+
+def _stash(match, context):
+    if not context.get("has_uncommitted"):
+        return None
+    return _plan(
+        "MEDIUM",
+        "Stash your uncommitted changes",
+        ["git stash push --include-untracked"],
+        "stash saves your changes (including new files) aside and gives you a clean working tree."
+    )
+
+def _stash_pop(match, context):
+    return _plan(
+        "MEDIUM",
+        "Re-apply your most recent stash",
+        ["git stash pop"],
+        "stash pop applies the latest stash to your files and removes it from the stash list."
+    )
+
+def _stage_all(match, context):
+    return _plan(
+        "MEDIUM",
+        "Stage all changes, including new and deleted files",
+        ["git add -A"],
+        "add -A stages every change in the working tree so the next commit includes it."
+    )
+
+def _discard_changes(match, context):
+    return _plan(
+        "HIGH",
+        "Discard all uncommitted changes to tracked files",
+        ["git reset --hard HEAD"],
+        "reset --hard HEAD overwrites tracked files with the last commit; untracked files are kept."
+    )
+
+def _status(match, context):
+    return _plan("LOW", "Show the working tree status", ["git status"],
+                 "status lists staged, unstaged and untracked changes.")
+
+def _log(match, context):
+    return _plan("LOW", "Show recent commit history", ["git log --oneline -n 20"],
+                 "log lists commits on the current branch, newest first.")
+
+_BRANCH = r"(?P<name>[A-Za-z0-9/_.-]+)"
+
+RULES = [
+    ("undo_commit_keep", r"(undo|revert|uncommit|remove)\s+(my\s+|the\s+)?last\s+commit\s*(,|but|and)?\s*(keep|keeping|preserve|save)\s+(my\s+|the\s+)?(files|changes|work)", _undo_commit_keep),
+    ("undo_commit_discard", r"(undo|revert|remove|delete)\s+(my\s+|the\s+)?last\s+commit\s*(,|and)?\s*(discard|delete|lose|throw\s+away)\s+(my\s+|the\s+|all\s+)?(files|changes|work)", _undo_commit_discard),
+    ("push", r"push(\s+(my|the|all))?(\s+(local\s+)?(changes|commits|work|code|branch))?(\s+to\s+(the\s+)?(origin|remote|github|gitlab|server))?", _push),
+    ("pull", r"pull(\s+(the\s+)?latest)?(\s+(changes|commits))?(\s+from\s+(the\s+)?(origin|remote|github|gitlab|upstream))?", _pull),
+    ("fetch", r"fetch(\s+(all|everything|updates))?(\s+from\s+(the\s+)?(remotes?|origin))?", _fetch),
+    ("create_branch", rf"(create|make|start|add)\s+(a\s+)?(new\s+)?branch\s+(called\s+|named\s+)?{_BRANCH}", _create_branch),
+    ("switch_branch", rf"(switch|checkout|change|go|move)\s+(to\s+)?(the\s+)?(branch\s+)?{_BRANCH}(\s+branch)?", _switch_branch),
+    ("delete_all_except", r"delete\s+all\s+(local\s+|other\s+)?branches\s+(except|but)\s+(?P<keep>[A-Za-z0-9/_., -]+)", _delete_all_except),
+    ("delete_branch", rf"(delete|remove)\s+(the\s+)?(local\s+)?branch\s+{_BRANCH}", _delete_branch),
+    ("stash", r"stash(\s+(my|all|the))?(\s+(changes|work|files))?", _stash),
+    ("stash_pop", r"(pop|apply|restore|unstash)(\s+(my|the))?(\s+(last|latest))?\s+stash(ed\s+changes)?", _stash_pop),
+    ("stage_all", r"(stage|add)\s+(all|everything)(\s+(files|changes))?", _stage_all),
+    ("discard_changes", r"(discard|throw\s+away|drop)\s+(all\s+)?(my\s+)?(local\s+|uncommitted\s+)?changes", _discard_changes),
+    ("status", r"(show\s+(me\s+)?)?(the\s+)?(git\s+)?status", _status),
+    ("log", r"(show\s+(me\s+)?)?(the\s+)?(commit\s+)?(history|log)", _log),
+]
+
+_COMPILED = [(name, re.compile(rf"^(?:{pattern})$", re.IGNORECASE), builder) for name, pattern, builder in RULES]
+
+def match_intent(intent: str, context: dict):
+    """
+    Build a plan locally for common intents.
+
+    Returns:
+        Plan dict in the same shape as get_git_plan(), or None if no rule
+        recognised the intent (or the rule needs the AI to resolve it)
+    """
+    if os.getenv("GITGUARD_NO_FAST_PLAN"):
+        return None
+    text = _normalize(intent)
+    for name, pattern, builder in _COMPILED:
+        match = pattern.match(text)
+        if not match:
+            continue
+        plan = builder(match, context or {})
+        if plan is not None:
+            logger.info(f"Fast planner matched rule '{name}' for intent: {intent}")
+            _record(name)
+            return plan
+        # A matched rule that declines still counts as a miss; keep looking in
+        # case a later, more specific rule applies
+    _record(None)
+    return None
+
+def _read_stats():
+    try:
+        with open(STATS_FILE) as f:
+            stats = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        stats = {}
+    stats.setdefault("hits", 0)
+    stats.setdefault("misses", 0)
+    stats.setdefault("rules", {})
+    return stats
+
+def _merge(stats, counts):
+    stats["hits"] += counts["hits"]
+    stats["misses"] += counts["misses"]
+    for rule, hits in counts["rules"].items():
+        stats["rules"][rule] = stats["rules"].get(rule, 0) + hits
+
+def load_stats():
+    """Return {'hits': int, 'misses': int, 'rules': {name: hits}}, including unflushed counts."""
+    stats = _read_stats()
+    with _pending_lock:
+        _merge(stats, _pending)
+    return stats
+
+def _record(rule):
+    global _flush_registered
+    with _pending_lock:
+        if rule:
+            _pending["hits"] += 1
+            _pending["rules"][rule] = _pending["rules"].get(rule, 0) + 1
+        else:
+            _pending["misses"] += 1
+        if not _flush_registered:
+            atexit.register(flush_stats)
+            _flush_registered = True
+
+def flush_stats():
+    """
+    Add the pending counts to STATS_FILE.
+
+    The read-modify-write holds STATS_LOCK so concurrent gitguard processes
+    do not overwrite each other's counts.
+    """
+    global _pending
+    with _pending_lock:
+        counts = _pending
+        _pending = {"hits": 0, "misses": 0, "rules": {}}
+    if not (counts["hits"] or counts["misses"]):
+        return
+    try:
+        STATS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with locked(STATS_LOCK):
+            stats = _read_stats()
+            _merge(stats, counts)
+            tmp = STATS_FILE.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(stats, f)
+            os.replace(tmp, STATS_FILE)
+    except OSError as e:
+        logger.warning(f"Could not update planner stats: {e}")
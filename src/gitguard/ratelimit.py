@@ -0,0 +1,199 @@
+import json
+import os
+import pathlib
+import random
+import time
+import logging
+
+from .filelock import locked, try_lock_fd, lock_fd, unlock_fd
+
+logger = logging.getLogger(__name__)
+
+# Requests per minute shared by every gitguard process of this user
+# (GITGUARD_RATE_LIMIT, 0 disables) and how many may go out back to back
+DEFAULT_RATE = 60.0
+DEFAULT_BURST = 10.0
+# Retries on 429/5xx (GITGUARD_API_RETRIES) and the backoff envelope in seconds
+DEFAULT_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+# Finished single-flight results are only handed to requests that were already waiting;
+# results and lock files older than this are swept
+INFLIGHT_TTL = 15 * 60
+
+STATE_NAME = 'ratelimit.json'
+LOCK_NAME = 'ratelimit.lock'
+INFLIGHT_DIR = 'inflight'
+
+def _state_dir() -> pathlib.Path:
+    return pathlib.Path.home() / '.gitguard'
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def rate() -> float:
+    return _env_float("GITGUARD_RATE_LIMIT", DEFAULT_RATE)
+
+def burst() -> float:
+    return max(1.0, _env_float("GITGUARD_RATE_BURST", DEFAULT_BURST))
+
+def max_retries() -> int:
+    return int(_env_float("GITGUARD_API_RETRIES", DEFAULT_RETRIES))
+
+def _read_state(path: pathlib.Path, now: float) -> dict:
+    try:
+        state = json.loads(path.read_text())
+        return {
+            "tokens": float(state["tokens"]),
+            "updated": float(state["updated"]),
+            "blocked_until": float(state.get("blocked_until", 0.0)),
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        return {"tokens": burst(), "updated": now, "blocked_until": 0.0}
+
+def _write_state(path: pathlib.Path, state: dict):
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+def acquire() -> float:
+    """
+    Take one request token from the bucket shared by all local gitguard processes.
+
+    The bucket (tokens, last refill, and a "blocked until" time set after a
+    429) lives in ~/.gitguard/ratelimit.json and is only touched under an
+    exclusive lock, so parallel CI jobs on one machine stay under the rate
+    together instead of each assuming it has the whole quota.
+
+    Returns:
+        Seconds spent waiting
+    """
+    per_second = rate() / 60.0
+    if per_second <= 0:
+        return 0.0
+    capacity = burst()
+    root = _state_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / STATE_NAME
+    waited = 0.0
+    while True:
+        with locked(root / LOCK_NAME):
+            now = time.time()
+            state = _read_state(path, now)
+            state["tokens"] = min(capacity, state["tokens"] + max(0.0, now - state["updated"]) * per_second)
+            state["updated"] = now
+            if now >= state["blocked_until"] and state["tokens"] >= 1.0:
+                state["tokens"] -= 1.0
+                _write_state(path, state)
+                if waited:
+                    logger.info(f"Rate limiter: waited {waited:.2f}s for a request slot")
+                return waited
+            _write_state(path, state)
+            delay = max(state["blocked_until"] - now, (1.0 - state["tokens"]) / per_second)
+        # A little jitter so waiting processes do not all retry in the same instant
+        delay += random.uniform(0, 0.05)
+        time.sleep(delay)
+        waited += delay
+
+def block_for(seconds: float):
+    """Tell every process to hold off for seconds (after a 429 or overload answer)."""
+    if rate() <= 0 or seconds <= 0:
+        return
+    root = _state_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / STATE_NAME
+    with locked(root / LOCK_NAME):
+        now = time.time()
+        state = _read_state(path, now)
+        state["blocked_until"] = max(state["blocked_until"], now + seconds)
+        _write_state(path, state)
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+def call_with_retries(call, retry_hint, describe: str = "request"):
+    """
+    Run call() under the shared rate limit, retrying transient failures.
+
+    Args:
+        call: Zero-argument function performing one API request
+        retry_hint: Maps an exception to None (do not retry) or the server's
+            suggested wait in seconds (0 when it gave none)
+        describe: Label for log messages
+
+    Raises:
+        Whatever call() raised last, once retries are exhausted or the error is not transient
+    """
+    attempts = max(0, max_retries())
+    for attempt in range(attempts + 1):
+        acquire()
+        try:
+            return call()
+        except Exception as e:
+            hint = retry_hint(e)
+            if hint is None or attempt == attempts:
+                raise
+            delay = max(hint, backoff_delay(attempt))
+            block_for(delay)
+            logger.warning(f"{describe} failed ({e}); retry {attempt + 1}/{attempts} in {delay:.1f}s")
+            time.sleep(delay)
+
+def _sweep(directory: pathlib.Path, now: float):
+    for path in directory.iterdir():
+        try:
+            if now - path.stat().st_mtime > INFLIGHT_TTL:
+                path.unlink()
+        except OSError:
+            pass
+
+def single_flight(key: str, call):
+    """
+    Run call() once for concurrent identical requests, across processes.
+
+    The first process to take the per-key lock makes the request and leaves
+    the JSON result next to the lock; processes that found the lock taken
+    wait for it and use that result instead of calling the API themselves.
+    If the leader failed, the next waiter makes the request. Disabled with
+    GITGUARD_NO_SINGLE_FLIGHT.
+
+    Args:
+        key: Hash identifying the request (model, schema, prompt, state)
+        call: Zero-argument function returning a JSON-serialisable result
+    """
+    if os.getenv("GITGUARD_NO_SINGLE_FLIGHT"):
+        return call()
+    directory = _state_dir() / INFLIGHT_DIR
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(directory / f"{key}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError as e:
+        logger.warning(f"Single-flight unavailable: {e}")
+        return call()
+    result_path = directory / f"{key}.json"
+    try:
+        if not try_lock_fd(fd):
+            waiting_since = time.time()
+            logger.info(f"Identical request {key[:12]} already in flight; waiting for it")
+            lock_fd(fd)
+            try:
+                if result_path.stat().st_mtime >= waiting_since:
+                    logger.info(f"Using result of in-flight request {key[:12]}")
+                    return json.loads(result_path.read_text())
+            except (OSError, ValueError):
+                pass  # The leader failed; make the request ourselves
+        try:
+            result = call()
+            if result is not None:
+                tmp = result_path.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(result))
+                os.replace(tmp, result_path)
+            _sweep(directory, time.time())
+            return result
+        finally:
+            unlock_fd(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,145 @@
+import math
+import re
+from collections import Counter
+
+# Bump whenever rules change so cached findings are invalidated
+RULES_VERSION = 3
+
+# (rule, severity, message, pattern). Compiled once into a single alternation so
+# each added line is matched in one pass regardless of how many rules exist.
+RULES = [
+    ("private_key", "HIGH", "Private key committed", r"-----BEGIN (?:RSA |EC |DSA |OPENSSH |PGP |ENCRYPTED )?PRIVATE KEY-----"),
+    ("aws_access_key", "HIGH", "AWS access key ID", r"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b"),
+    ("github_token", "HIGH", "GitHub token", r"\bgh[pousr]_[A-Za-z0-9]{36,}\b"),
+    ("google_api_key", "HIGH", "Google API key", r"\bAIza[0-9A-Za-z_\-]{35}\b"),
+    ("slack_token", "HIGH", "Slack token", r"\bxox[abposr]-[A-Za-z0-9-]{10,}\b"),
+    ("stripe_key", "HIGH", "Stripe live secret key", r"\b[rs]k_live_[0-9A-Za-z]{20,}\b"),
+    ("api_secret_key", "HIGH", "API secret key", r"\bsk-[A-Za-z0-9_\-]{32,}\b"),
+    ("jwt", "MEDIUM", "JSON Web Token", r"\beyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\b"),
+    ("credential_assignment", "HIGH", "Hardcoded credential",
+     r"(?i:\b(?:password|passwd|pwd|secret|api_?key|access_?token|auth_?token|client_?secret)\b)[\"']?\s*[:=]\s*[\"'](?P<credential>[^\"'\s]{6,})[\"']"),
+    ("debug_statement", "LOW", "Debug statement left in",
+     r"\bconsole\.(?:log|debug|trace)\(|\bdebugger;|\bpdb\.set_trace\(\)|\bbreakpoint\(\)|\bbinding\.pry\b|\bvar_dump\(|\bdd\("),
+    ("todo", "LOW", "TODO/FIXME marker", r"\b(?:TODO|FIXME|XXX|HACK)\b"),
+]
+
+_RULE_INFO = {name: (severity, message) for name, severity, message, _ in RULES}
+_MATCHER = re.compile("|".join(f"(?P<{name}>{pattern})" for name, _, _, pattern in RULES))
+_SECRET_RULES = {name for name, severity, _, _ in RULES if severity != "LOW"}
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9+/_\-=]{24,}")
+_HEX_RE = re.compile(r"^[0-9a-fA-F]+$")
+_PLACEHOLDER_RE = re.compile(r"(?i)^(?:x+|\*+|changeme|password|example|dummy|test|secret|your[_-].*|<.*>|\$\{.*\}|\{\{.*\}\})$")
+_HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)")
+
+ENTROPY_THRESHOLD = 4.5
+HEX_ENTROPY_THRESHOLD = 3.5
+SEVERITY_ORDER = {"LOW": 0, "MEDIUM": 1, "HIGH": 2}
+
+def shannon_entropy(text: str) -> float:
+    """Bits of entropy per character."""
+    if not text:
+        return 0.0
+    length = len(text)
+    return -sum(n / length * math.log2(n / length) for n in Counter(text).values())
+
+def _is_high_entropy(token: str) -> bool:
+    if _HEX_RE.match(token):
+        return len(token) >= 32 and shannon_entropy(token) >= HEX_ENTROPY_THRESHOLD
+    has_digit = any(c.isdigit() for c in token)
+    has_alpha = any(c.isalpha() for c in token)
+    return has_digit and has_alpha and shannon_entropy(token) >= ENTROPY_THRESHOLD
+
+def scan_line(line: str, entropy: bool = True):
+    """
+    Return (rule, severity, message, span) tuples for one line of added code.
+
+    Args:
+        entropy: Also flag high-entropy tokens when no named rule matched
+    """
+    findings = []
+    seen = set()
+    for match in _MATCHER.finditer(line):
+        rule = match.lastgroup
+        span = match.span()
+        if rule == "credential_assignment":
+            if _PLACEHOLDER_RE.match(match.group("credential")):
+                continue
+            # Only the value is secret; keep the variable name readable
+            span = match.span("credential")
+        if rule in seen:
+            continue
+        seen.add(rule)
+        severity, message = _RULE_INFO[rule]
+        findings.append((rule, severity, message, span))
+    if entropy and not seen & _SECRET_RULES:
+        for match in _TOKEN_RE.finditer(line):
+            if _is_high_entropy(match.group()):
+                findings.append(("high_entropy", "MEDIUM", "High-entropy string (possible secret)", match.span()))
+                break
+    return findings
+
+def iter_added_lines(file_diff):
+    """Yield (line_number, text) for every added line of a diffpack.FileDiff."""
+    for hunk in file_diff.hunks:
+        line_no = 0
+        for raw in hunk.splitlines():
+            if raw.startswith("@@"):
+                match = _HUNK_RE.match(raw)
+                line_no = int(match.group(1)) if match else 0
+            elif raw.startswith("+"):
+                yield line_no, raw[1:]
+                line_no += 1
+            elif not raw.startswith("-") and not raw.startswith("\\"):
+                line_no += 1
+
+def scan_file(file_diff):
+    """
+    Return structured findings for one file's added lines.
+
+    Lockfiles and generated files (dist/, build/, vendor/, *.min.js, ...) are
+    scanned too, since committed build output is where leaked keys often end
+    up, but only for named secret patterns: debug statements and TODOs there
+    are not the author's, and the entropy heuristic would flag every integrity
+    hash and minified identifier. Binary files have no lines to scan.
+    """
+    if file_diff.binary:
+        return []
+    secrets_only = file_diff.skip_reason is not None
+    findings = []
+    for line_no, text in iter_added_lines(file_diff):
+        for rule, severity, message, _ in scan_line(text, entropy=not secrets_only):
+            if secrets_only and severity == "LOW":
+                continue
+            findings.append({
+                "path": file_diff.path,
+                "line": line_no,
+                "rule": rule,
+                "severity": severity,
+                "message": message,
+            })
+    return findings
+
+def findings_to_result(findings: list[dict]) -> dict:
+    """Shape findings like an AuditResult: issues, severity and passed."""
+    severity = "LOW"
+    for finding in findings:
+        if SEVERITY_ORDER[finding["severity"]] > SEVERITY_ORDER[severity]:
+            severity = finding["severity"]
+    return {
+        "issues": [f"{f['path']}:{f['line']}: {f['message']} ({f['rule']})" for f in findings],
+        "severity": severity,
+        "passed": severity != "HIGH",
+        "findings": findings,
+    }
+
+def redact(diff_text: str) -> str:
+    """Mask secrets found on added lines so they are never sent to the AI."""
+    out = []
+    for line in diff_text.splitlines(keepends=True):
+        if line.startswith("+") and not line.startswith("+++"):
+            spans = [span for rule, severity, _, span in scan_line(line) if severity != "LOW"]
+            for start, end in sorted(spans, reverse=True):
+                line = line[:start] + "[REDACTED]" + line[end:]
+        out.append(line)
+    return "".join(out)
@@ -0,0 +1,159 @@
+import contextlib
+import os
+import pathlib
+import shutil
+import subprocess
+import tempfile
+import logging
+
+from . import gitexec
+
+logger = logging.getLogger(__name__)
+
+# Fixed identity so snapshots work in repos without user.name/user.email
+SNAPSHOT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "GitGuard",
+    "GIT_AUTHOR_EMAIL": "gitguard@localhost",
+    "GIT_COMMITTER_NAME": "GitGuard",
+    "GIT_COMMITTER_EMAIL": "gitguard@localhost",
+}
+
+def _git(args, env=None, input=None) -> str:
+    return gitexec.output(args, env=env, input=input)
+
+@contextlib.contextmanager
+def _scratch_index():
+    """
+    Yield an environment whose GIT_INDEX_FILE is a temporary copy of the real index.
+
+    Copying (rather than starting empty) keeps the stat cache, so `git add -A`
+    only re-hashes files whose stat data changed.
+    """
+    scratch_dir = pathlib.Path('.git') / 'gitguard'
+    scratch_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_index = tempfile.mkstemp(prefix="index.", dir=scratch_dir)
+    os.close(fd)
+    try:
+        real_index = pathlib.Path('.git') / 'index'
+        if real_index.exists():
+            shutil.copyfile(real_index, tmp_index)
+        else:
+            os.unlink(tmp_index)
+        yield {**os.environ, "GIT_INDEX_FILE": tmp_index}
+    finally:
+        try:
+            os.unlink(tmp_index)
+        except FileNotFoundError:
+            pass
+
+def _add_all(env) -> str:
+    """Stage the whole worktree into env's index and return its tree."""
+    _git(["add", "-A"], env=env)
+    return _git(["write-tree"], env=env)
+
+def take_snapshot(head: str, label: str = "checkpoint") -> dict:
+    """
+    Record HEAD, the index and the full worktree as one commit.
+
+    The snapshot commit's tree is the worktree (tracked and untracked files,
+    ignores honoured); its first parent is HEAD and its second parent a commit
+    of the index tree, so all three stay reachable from a single ref. The three
+    OIDs are also written as trailers for direct lookup.
+
+    Args:
+        head: Commit OID of HEAD
+        label: Short description for the commit message
+
+    Returns:
+        {"commit", "head", "index_tree", "worktree_tree"}
+
+    Raises:
+        subprocess.CalledProcessError: If any git step fails
+    """
+    env = {**os.environ, **SNAPSHOT_IDENTITY}
+    try:
+        index_tree = _git(["write-tree"])
+    except subprocess.CalledProcessError:
+        # Unmerged entries cannot be written as a tree; fall back to HEAD's
+        logger.warning("Index has conflicts; snapshotting HEAD's tree as the index")
+        index_tree = _git(["rev-parse", f"{head}^{{tree}}"])
+    with _scratch_index() as scratch:
+        worktree_tree = _add_all(scratch)
+
+    index_commit = _git(["commit-tree", index_tree, "-p", head, "-m", f"gitguard index: {label}"], env=env)
+    message = (
+        f"gitguard {label}\n\n"
+        f"GitGuard-Head: {head}\n"
+        f"GitGuard-Index-Tree: {index_tree}\n"
+        f"GitGuard-Worktree-Tree: {worktree_tree}\n"
+    )
+    commit = _git(["commit-tree", worktree_tree, "-p", head, "-p", index_commit], env=env, input=message)
+    logger.info(f"Snapshot {commit}: head={head} index={index_tree} worktree={worktree_tree}")
+    return {
+        "commit": commit,
+        "head": head,
+        "index_tree": index_tree,
+        "worktree_tree": worktree_tree,
+    }
+
+def _stage_tracked(env) -> str:
+    """Stage tracked files' worktree state into env's index and return its tree; untracked files are left out."""
+    _git(["add", "-u"], env=env)
+    return _git(["write-tree"], env=env)
+
+def restore_snapshot(snapshot: dict) -> dict:
+    """
+    Bring HEAD, index and worktree back to a snapshot, rewriting only what differs.
+
+    Tracked files are staged into a scratch index (`add -u`, so untracked
+    files created since the snapshot are never candidates for deletion), and
+    `read-tree --reset -u <current> <snapshot>` rewrites only the paths whose
+    content differs between the two trees; unchanged files keep their mtimes.
+    Paths in the snapshot that are untracked now are overwritten with the
+    snapshot's content. The snapshot's index tree is then read over that
+    scratch index with `read-tree -m`, which keeps stat info for entries whose
+    content matches.
+
+    HEAD (or the branch it points to) is moved before the new index replaces
+    the real one, and that replacement is a single rename, so a failure never
+    leaves the snapshot's index on top of the old HEAD.
+
+    Args:
+        snapshot: Dict with "head", "index_tree" and "worktree_tree"
+
+    Returns:
+        {"worktree_paths": int, "index_paths": int}: paths rewritten in each
+    """
+    real_index = pathlib.Path('.git') / 'index'
+    with _scratch_index() as scratch:
+        current_tree = _stage_tracked(scratch)
+        try:
+            current_index_tree = _git(["write-tree"])
+        except subprocess.CalledProcessError:
+            current_index_tree = None
+
+        worktree_paths = 0
+        if current_tree != snapshot["worktree_tree"]:
+            changed = _git(["diff-tree", "-r", "--name-only", "-z", current_tree, snapshot["worktree_tree"]])
+            worktree_paths = len([p for p in changed.split("\0") if p])
+            _git(["read-tree", "--reset", "-u", current_tree, snapshot["worktree_tree"]], env=scratch)
+
+        index_paths = 0
+        if current_index_tree != snapshot["index_tree"]:
+            if current_index_tree:
+                changed = _git(["diff-tree", "-r", "--name-only", "-z", current_index_tree, snapshot["index_tree"]])
+                index_paths = len([p for p in changed.split("\0") if p])
+            else:
+                index_paths = -1
+        _git(["read-tree", "-m", snapshot["index_tree"]], env=scratch)
+
+        _git(["update-ref", "-m", "gitguard: rollback", "HEAD", snapshot["head"]])
+        try:
+            os.replace(scratch["GIT_INDEX_FILE"], real_index)
+        except OSError as e:
+            # HEAD already moved; fall back to letting git write the index
+            logger.warning(f"Could not replace index ({e}); reading snapshot index tree instead")
+            _git(["read-tree", snapshot["index_tree"]])
+
+    logger.info(f"Restored snapshot: {worktree_paths} worktree path(s), {index_paths} index path(s)")
+    return {"worktree_paths": worktree_paths, "index_paths": index_paths}
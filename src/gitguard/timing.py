@@ -0,0 +1,173 @@
+import json
+import os
+import pathlib
+import sys
+import threading
+import time
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+_enabled = False
+_started = 0.0
+_records = []
+_records_lock = threading.Lock()
+_local = threading.local()
+_next_id = 0
+# Processes started since profiling was enabled (counted by an audit hook)
+_subprocesses = 0
+_hook_installed = False
+
+def _audit_hook(event, args):
+    global _subprocesses
+    if _enabled and event in ("subprocess.Popen", "os.system"):
+        _subprocesses += 1
+
+class _NoopSpan:
+    """Returned by span() when profiling is off: no clock reads, no allocation."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NOOP = _NoopSpan()
+
+class Span:
+    """
+    One timed phase. Nested spans on the same thread record their parent.
+
+    Attributes added with set() (sizes, cache hits, counts) are written with
+    the span when it ends.
+    """
+
+    __slots__ = ("name", "attrs", "id", "parent", "start", "subprocs")
+
+    def __init__(self, name: str, attrs: dict):
+        global _next_id
+        self.name = name
+        self.attrs = attrs
+        with _records_lock:
+            _next_id += 1
+            self.id = _next_id
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].id if stack else None
+        stack.append(self)
+        self.subprocs = _subprocesses
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        _local.stack.pop()
+        record = {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "start_ms": round((self.start - _started) * 1000, 2),
+            "ms": round(elapsed * 1000, 2),
+            "subprocesses": _subprocesses - self.subprocs,
+            "thread": threading.current_thread().name,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.attrs:
+            record["attrs"] = self.attrs
+        with _records_lock:
+            _records.append(record)
+        return False
+
+def enable(on: bool = True):
+    """Turn profiling on (or off) and start a fresh recording."""
+    global _enabled, _started, _records, _subprocesses, _hook_installed
+    _enabled = on
+    with _records_lock:
+        _records = []
+    _subprocesses = 0
+    _started = time.perf_counter()
+    if on and not _hook_installed:
+        # Audit hooks cannot be removed, so install only once profiling is wanted
+        sys.addaudithook(_audit_hook)
+        _hook_installed = True
+
+def enabled() -> bool:
+    return _enabled
+
+def span(name: str, **attrs):
+    """
+    Time a phase: `with span("gemini.plan", prompt_bytes=n) as s: ...; s.set(cache="hit")`.
+
+    Costs one global lookup when profiling is off.
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+def records() -> list:
+    """Finished spans so far, in start order."""
+    with _records_lock:
+        return sorted(_records, key=lambda r: r["start_ms"])
+
+def write_report(command: str = None, **extra) -> pathlib.Path:
+    """
+    Write the recorded spans as JSON to ~/.gitguard/logs/profile_<time>_<pid>.json.
+
+    Keyword arguments are stored alongside the spans (e.g. the git call log).
+
+    Returns:
+        Path of the written file, or None if it could not be written
+    """
+    report = {
+        "command": command,
+        "argv": sys.argv[1:],
+        "cwd": os.getcwd(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "total_ms": round((time.perf_counter() - _started) * 1000, 2),
+        "subprocesses": _subprocesses,
+        "spans": records(),
+        **extra,
+    }
+    log_dir = pathlib.Path.home() / '.gitguard' / 'logs'
+    path = log_dir / f"profile_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}.json"
+    try:
+        log_dir.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2, default=str))
+    except OSError as e:
+        logger.warning(f"Could not write profile {path}: {e}")
+        return None
+    logger.info(f"Profile written to {path}")
+    return path
+
+def format_report(spans: list) -> list:
+    """Render spans as indented text lines (children under their parent)."""
+    children = {}
+    for record in spans:
+        children.setdefault(record["parent"], []).append(record)
+    known = {record["id"] for record in spans}
+    lines = []
+
+    def walk(record, depth):
+        attrs = " ".join(f"{k}={v}" for k, v in (record.get("attrs") or {}).items())
+        procs = f"{record['subprocesses']} proc" if record["subprocesses"] else ""
+        label = "  " * depth + record["name"]
+        lines.append(f"{label:<40} {record['ms']:>9.1f}ms  {procs:<8} {attrs}".rstrip())
+        for child in children.get(record["id"], []):
+            walk(child, depth + 1)
+
+    for record in spans:
+        # Roots, plus spans whose parent never finished (e.g. an exception unwound it)
+        if record["parent"] is None or record["parent"] not in known:
+            walk(record, 0)
+    return lines
@@ -0,0 +1,125 @@
+import atexit
+import os
+import threading
+import time
+import logging
+
+from . import cassette
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+MAX_KEEPALIVE_CONNECTIONS = 8
+KEEPALIVE_EXPIRY = 120.0
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "new_connections": 0,
+    "connect_ms": 0.0,
+    "tls_ms": 0.0,
+    "request_ms": 0.0,
+}
+
+def request_timeout() -> float:
+    """Seconds allowed per Gemini HTTP request (GITGUARD_HTTP_TIMEOUT)."""
+    try:
+        return float(os.getenv("GITGUARD_HTTP_TIMEOUT", DEFAULT_TIMEOUT))
+    except ValueError:
+        return DEFAULT_TIMEOUT
+
+def api_base_url():
+    """Override for the Gemini endpoint (GITGUARD_GEMINI_BASE_URL), e.g. a local stub; None for the default."""
+    return os.getenv("GITGUARD_GEMINI_BASE_URL") or None
+
+def connection_stats() -> dict:
+    """Totals for this process: requests, new connections and time spent in each phase."""
+    with _stats_lock:
+        return dict(_stats)
+
+class _RequestTrace:
+    """
+    httpcore trace callback for one request.
+
+    Records how long TCP connect and the TLS handshake took (both zero when a
+    pooled connection was reused) and the time until response headers arrived.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phase_started = {}
+        self.connect_ms = 0.0
+        self.tls_ms = 0.0
+        self.new_connection = False
+
+    def __call__(self, event: str, info: dict):
+        name, _, stage = event.rpartition(".")
+        if stage == "started":
+            self.phase_started[name] = time.perf_counter()
+        elif stage == "complete" and name in self.phase_started:
+            elapsed = (time.perf_counter() - self.phase_started.pop(name)) * 1000
+            if name.endswith("connect_tcp") or name.endswith("connect_unix_socket"):
+                self.connect_ms += elapsed
+                self.new_connection = True
+            elif name.endswith("start_tls"):
+                self.tls_ms += elapsed
+
+    def finish(self, request):
+        total_ms = (time.perf_counter() - self.started) * 1000
+        with _stats_lock:
+            _stats["requests"] += 1
+            _stats["new_connections"] += int(self.new_connection)
+            _stats["connect_ms"] += self.connect_ms
+            _stats["tls_ms"] += self.tls_ms
+            _stats["request_ms"] += total_ms
+        reuse = "new connection" if self.new_connection else "reused connection"
+        logger.info(
+            f"HTTP {request.method} {request.url.host}: response headers after {total_ms:.0f}ms, "
+            f"connect {self.connect_ms:.0f}ms, tls {self.tls_ms:.0f}ms ({reuse})"
+        )
+
+def _on_request(request):
+    request.extensions["trace"] = _RequestTrace()
+
+def _on_response(response):
+    trace = response.request.extensions.get("trace")
+    if isinstance(trace, _RequestTrace):
+        trace.finish(response.request)
+
+def make_http_client(timeout: float = None):
+    """
+    Build a keep-alive httpx client with connection/TLS timing instrumentation.
+
+    One of these is shared by every Gemini call in the process, so repeated
+    calls (plan, fix retries, audit chunks) reuse pooled connections instead
+    of paying a fresh TLS handshake each time. With GITGUARD_CASSETTE set,
+    requests are recorded to or replayed from disk (see cassette.py).
+    """
+    import httpx
+
+    timeout = timeout or request_timeout()
+    transport = httpx.HTTPTransport(
+        limits=httpx.Limits(
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        )
+    )
+    config = cassette.settings()
+    if config:
+        logger.info(f"Gemini cassette: {config[1]} in {config[0]}")
+        transport = cassette.make_transport(transport, config)
+    return httpx.Client(
+        timeout=httpx.Timeout(timeout, connect=min(DEFAULT_CONNECT_TIMEOUT, timeout)),
+        transport=transport,
+        event_hooks={"request": [_on_request], "response": [_on_response]}
+    )
+
+@atexit.register
+def _log_totals():
+    stats = connection_stats()
+    if stats["requests"]:
+        logger.info(
+            f"HTTP totals: {stats['requests']} request(s) over {stats['new_connections']} new connection(s); "
+            f"connect {stats['connect_ms']:.0f}ms, tls {stats['tls_ms']:.0f}ms, requests {stats['request_ms']:.0f}ms"
+        )
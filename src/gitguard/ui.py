@@ -0,0 +1,133 @@
+import contextlib
+import json
+import re
+import sys
+
+import typer
+
+OUTPUT_MODES = ("text", "json", "ndjson")
+
+_console = None
+_mode = "text"
+_assume_yes = False
+_events = {}
+
+# Rich markup tags such as [bold red], [/cyan] or [/]
+_MARKUP_RE = re.compile(r"\[/?[a-zA-Z#][^\[\]]*\]|\[/\]")
+
+
+def set_output_mode(mode: str, assume_yes: bool = False):
+    """
+    Select how results are written.
+
+    text: rich panels and tables on stdout (the default).
+    json: one JSON object on stdout when the command finishes, keyed by event.
+    ndjson: one {"event": ..., "data": ...} line per event as it happens.
+
+    In json/ndjson modes human-readable messages go to stderr as plain text,
+    so stdout only ever carries JSON, and nothing is rendered with rich. Commands
+    that do not call the AI never import rich at all; those that do still load
+    it, because httpx imports it for its own command-line tool.
+    """
+    global _mode, _assume_yes, _events
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode: {mode}")
+    _mode = mode
+    _assume_yes = assume_yes
+    _events = {}
+
+
+def machine_output() -> bool:
+    return _mode != "text"
+
+
+def get_console():
+    """Return the shared rich Console, importing rich on first use."""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+
+def print(*objects, **kwargs):
+    """Drop-in for rich.print that only imports rich when something is printed."""
+    if _mode != "text":
+        text = " ".join(_MARKUP_RE.sub("", o) if isinstance(o, str) else str(o) for o in objects)
+        sys.stderr.write(text + "\n")
+        return
+    from rich import print as rich_print
+    rich_print(*objects, **kwargs)
+
+
+def emit(event: str, data, many: bool = False):
+    """
+    Record a machine-readable result (no-op in text mode).
+
+    Args:
+        event: Key in the json object / "event" field in ndjson
+        data: JSON-serialisable payload
+        many: Event can occur several times; collected into a list in json mode
+    """
+    if _mode == "ndjson":
+        sys.stdout.write(json.dumps({"event": event, "data": data}, default=str) + "\n")
+        sys.stdout.flush()
+    elif _mode == "json":
+        if many:
+            _events.setdefault(event, []).append(data)
+        else:
+            _events[event] = data
+
+
+def finish_output():
+    """Write the collected json object (json mode only)."""
+    global _events
+    if _mode == "json" and _events:
+        sys.stdout.write(json.dumps(_events, default=str) + "\n")
+        sys.stdout.flush()
+    _events = {}
+
+
+def status(text: str):
+    """Spinner while waiting; nothing at all in json/ndjson modes."""
+    if _mode != "text":
+        return contextlib.nullcontext()
+    return get_console().status(text, spinner="dots")
+
+
+def confirm(text: str, default: bool = False) -> bool:
+    """
+    Ask a yes/no question.
+
+    --yes answers yes to everything. In json/ndjson modes nobody is there to
+    answer, so anything not covered by --yes is declined.
+    """
+    if _assume_yes:
+        return True
+    if _mode != "text":
+        print(f"{text.strip()} (declined: non-interactive output, pass --yes to accept)")
+        return False
+    return typer.confirm(text, default=default)
+
+
+def prompt(text: str) -> str:
+    """Ask for a value; fails in json/ndjson modes, where nobody can answer."""
+    if _mode != "text":
+        print(f"Input required: {text}")
+        emit("error", {"message": "input required", "prompt": text})
+        raise typer.Exit(2)
+    return typer.prompt(text)
+
+
+def reset_console():
+    """
+    Forget cached consoles so the next print binds to the current sys.stdout.
+
+    The daemon swaps stdio for every request; rich's own global console would
+    otherwise keep writing to the previous client's terminal settings.
+    """
+    global _console
+    _console = None
+    rich = sys.modules.get("rich")
+    if rich is not None:
+        rich._console = None
@@ -0,0 +1,46 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+SRC = pathlib.Path(__file__).resolve().parent.parent / "src"
+
+# Modules `gitguard status --help` must not load (see lazy.py)
+HEAVY_MODULES = ["google.genai", "git", "rich"]
+
+PROBE = """
+import json, sys
+sys.argv = {argv!r}
+from gitguard.client import main
+try:
+    main()
+except SystemExit:
+    pass
+print(json.dumps([name for name in {modules!r} if name in sys.modules]))
+"""
+
+def _loaded_modules(tmp_path, argv):
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(SRC) + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "HOME": str(tmp_path),
+        "GITGUARD_NO_DAEMON": "1",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(argv=argv, modules=HEAVY_MODULES)],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+@pytest.mark.parametrize("argv", [
+    ["gitguard", "status", "--help"],
+    ["gitguard", "--help"],
+])
+def test_help_does_not_import_heavy_modules(tmp_path, argv):
+    assert _loaded_modules(tmp_path, argv) == "[]"
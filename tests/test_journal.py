@@ -0,0 +1,134 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from gitguard import journal as journal_module
+from gitguard.journal import CheckpointJournal
+
+SRC = pathlib.Path(__file__).resolve().parent.parent / "src"
+
+def _cp(n):
+    return {"id": f"20250101_0000{n:02d}", "ref": f"refs/gitguard/checkpoints/20250101_0000{n:02d}", "created": f"20250101_0000{n:02d}"}
+
+@pytest.fixture
+def journal(tmp_path):
+    return CheckpointJournal(tmp_path)
+
+def _add(journal, *ns):
+    with journal.lock():
+        for n in ns:
+            journal.add(_cp(n))
+
+def test_entries_newest_first_and_latest(journal):
+    _add(journal, 1, 2, 3)
+    assert [cp["id"] for cp in journal.entries()] == [_cp(3)["id"], _cp(2)["id"], _cp(1)["id"]]
+    assert journal.latest() == _cp(3)
+    assert journal.get(_cp(2)["id"]) == _cp(2)
+
+def test_drop_repoints_latest_at_newest_survivor(journal):
+    _add(journal, 1, 2, 3)
+    with journal.lock():
+        journal.drop([_cp(3)["id"]])
+    assert journal.latest() == _cp(2)
+    with journal.lock():
+        journal.drop([_cp(1)["id"], _cp(2)["id"]])
+    assert journal.latest() is None
+    assert journal.entries() == []
+
+def test_writes_require_the_lock(journal):
+    with pytest.raises(AssertionError):
+        journal.add(_cp(1))
+
+def test_torn_tail_is_ignored_then_truncated(journal):
+    _add(journal, 1, 2)
+    with open(journal.path, "ab") as f:
+        f.write(b'{"op":"add","cp":{"id":"torn"')
+    # A crash mid-append leaves a partial line: readers skip it
+    assert [cp["id"] for cp in journal.entries()] == [_cp(2)["id"], _cp(1)["id"]]
+    assert journal.latest() == _cp(2)
+    # The next writer cuts it off before appending
+    _add(journal, 3)
+    lines = journal.path.read_bytes().splitlines()
+    assert len(lines) == 3
+    assert all(json.loads(line)["op"] == "add" for line in lines)
+    assert journal.latest() == _cp(3)
+
+def test_torn_tail_longer_than_one_read_block(journal):
+    _add(journal, 1)
+    with open(journal.path, "ab") as f:
+        f.write(b"x" * 10000)
+    assert journal.latest() == _cp(1)
+    _add(journal, 2)
+    assert journal.path.read_bytes().endswith(b"\n")
+    assert [cp["id"] for cp in journal.entries()] == [_cp(2)["id"], _cp(1)["id"]]
+
+def test_corrupt_complete_line_is_skipped(journal):
+    _add(journal, 1)
+    with open(journal.path, "ab") as f:
+        f.write(b"not json\n")
+    _add(journal, 2)
+    assert [cp["id"] for cp in journal.entries()] == [_cp(2)["id"], _cp(1)["id"]]
+    assert journal.latest() == _cp(2)
+
+def test_compaction_keeps_only_live_checkpoints(journal, monkeypatch):
+    monkeypatch.setattr(journal_module, "COMPACT_SLACK", 4)
+    _add(journal, *range(1, 11))
+    with journal.lock():
+        for n in range(1, 8):
+            journal.drop([_cp(n)["id"]])
+    live = [_cp(10), _cp(9), _cp(8)]
+    assert journal.entries() == live
+    # 10 adds + 7 drops exceeded 3 live + 4 slack, so the file was rewritten
+    records = [json.loads(line) for line in journal.path.read_bytes().splitlines()]
+    assert len(records) < 10 + 7
+    assert journal.latest() == _cp(10)
+    with journal.lock():
+        journal.compact()
+    records = [json.loads(line) for line in journal.path.read_bytes().splitlines()]
+    assert [r["cp"]["id"] for r in records] == [cp["id"] for cp in reversed(live)]
+    assert journal.latest() == _cp(10)
+    assert not journal.path.with_suffix(".log.tmp").exists()
+
+def test_legacy_json_is_migrated(tmp_path):
+    (tmp_path / "checkpoints.json").write_text(json.dumps([_cp(2), _cp(1)]))
+    journal = CheckpointJournal(tmp_path)
+    assert journal.latest() == _cp(2)
+    assert [cp["id"] for cp in journal.entries()] == [_cp(2)["id"], _cp(1)["id"]]
+    assert (tmp_path / "checkpoints.json.migrated").exists()
+
+CREATE = """
+from gitguard.git_ops import create_checkpoint
+print(create_checkpoint())
+"""
+
+def _git(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, text=True).stdout
+
+def test_concurrent_checkpoints_get_unique_ids(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q")
+    _git(repo, "-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "-q", "--allow-empty", "-m", "init")
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(SRC) + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "HOME": str(tmp_path),
+        "GITGUARD_NO_DAEMON": "1",
+    }
+    procs = [
+        subprocess.Popen([sys.executable, "-c", CREATE], cwd=repo, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(6)
+    ]
+    results = [p.communicate() for p in procs]
+    assert all(p.returncode == 0 for p in procs), results
+    refs = [out.strip().splitlines()[-1] for out, _ in results]
+    assert len(set(refs)) == 6
+    assert sorted(_git(repo, "for-each-ref", "--format=%(refname)", "refs/gitguard/checkpoints/").split()) == sorted(refs)
+    entries = CheckpointJournal(repo / ".git" / "gitguard").entries()
+    assert sorted(cp["ref"] for cp in entries) == sorted(refs)
+    assert len({cp["id"] for cp in entries}) == 6
@@ -0,0 +1,99 @@
+import json
+import random
+
+import pytest
+
+from gitguard.jsonstream import PartialJSONParser
+
+DOCUMENTS = [
+    {
+        "risk": "MEDIUM",
+        "summary": "Push local 'main' to origin",
+        "commands": ["git push -u origin main", "git status"],
+        "missing_info_prompt": None,
+        "explanation": "Pushing sends your commits to the remote.\nLine two with \"quotes\" and a \\ backslash.",
+    },
+    {
+        "what_it_does": "Unicode: café ☃ \U0001f600, escaped é and tab\tinside",
+        "use_cases": [],
+        "nested": {"a": [1, 2.5, -3e2, True, False, None, {"deep": ["x", {"y": "z"}]}], "b": {}},
+        "count": 1234567,
+    },
+    {"issues": ["a:1: TODO", "b:2: debug"] * 5, "severity": "LOW", "passed": True},
+]
+
+def _is_partial(part, full) -> bool:
+    """True if part is a view of full that a stream could have produced so far."""
+    if isinstance(full, dict):
+        return isinstance(part, dict) and all(k in full and _is_partial(v, full[k]) for k, v in part.items())
+    if isinstance(full, list):
+        return (isinstance(part, list) and len(part) <= len(full)
+                and all(_is_partial(p, f) for p, f in zip(part, full)))
+    if isinstance(full, str):
+        return isinstance(part, str) and full.startswith(part)
+    return part == full and type(part) is type(full)
+
+def _random_chunks(text, rng):
+    chunks = []
+    i = 0
+    while i < len(text):
+        size = rng.choice([1, 1, 2, 3, 7, 16, 64])
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_random_splits_always_yield_a_consistent_prefix(document, indent, ensure_ascii):
+    text = json.dumps(document, indent=indent, ensure_ascii=ensure_ascii)
+    rng = random.Random(f"{indent}-{ensure_ascii}-{len(text)}")
+    for _ in range(50):
+        parser = PartialJSONParser()
+        for chunk in _random_chunks(text, rng):
+            snapshot = parser.feed(chunk)
+            assert snapshot is None or _is_partial(snapshot, document), (chunk, snapshot)
+        assert parser.snapshot() == document
+
+def test_every_single_character_split():
+    text = json.dumps(DOCUMENTS[0])
+    parser = PartialJSONParser()
+    seen = []
+    for ch in text:
+        seen.append(parser.feed(ch))
+    assert seen[-1] == DOCUMENTS[0]
+    assert all(s is None or _is_partial(s, DOCUMENTS[0]) for s in seen)
+
+def test_string_value_streams_while_keys_and_numbers_wait():
+    parser = PartialJSONParser()
+    assert parser.feed('  ') is None
+    assert parser.feed('{"summ') == {}
+    assert parser.feed('ary": "Push loc') == {"summary": "Push loc"}
+    assert parser.feed('al", "count": 12') == {"summary": "Push local"}
+    assert parser.feed('3, "ok": tr') == {"summary": "Push local", "count": 123}
+    assert parser.feed('ue}') == {"summary": "Push local", "count": 123, "ok": True}
+
+def test_half_written_escapes_are_not_exposed():
+    parser = PartialJSONParser()
+    parser.feed('{"a": "x\\')
+    assert parser.snapshot() == {"a": "x"}
+    parser.feed('u00')
+    assert parser.snapshot() in ({}, {"a": "x"})
+    parser.feed('e9"}')
+    assert parser.snapshot() == {"a": "xé"}
+
+def test_snapshot_does_not_consume_input():
+    parser = PartialJSONParser()
+    parser.feed('{"a": [1, ')
+    assert parser.snapshot() == parser.snapshot() == {"a": [1]}
+    assert parser.feed('2]}') == {"a": [1, 2]}
+
+def test_split_surrogate_pair_is_never_exposed_half_written():
+    parser = PartialJSONParser()
+    assert parser.feed('{"a": "hi \\ud83d') == {"a": "hi "}
+    assert parser.feed('\\') == {"a": "hi "}
+    assert parser.feed('ude00 there"}') == {"a": "hi \U0001f600 there"}
+
+def test_escaped_backslash_before_u_is_plain_text():
+    parser = PartialJSONParser()
+    assert parser.feed('{"path": "C:\\\\ud83d') == {"path": "C:\\ud83d"}
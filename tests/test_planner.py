@@ -0,0 +1,110 @@
+import json
+import threading
+
+import pytest
+
+from gitguard import planner
+from gitguard.planner import match_intent
+
+CONTEXT = {
+    "branch": "main",
+    "detached": False,
+    "upstream": "origin/main",
+    "remotes": ["origin"],
+    "all_branches": ["main", "feature", "old"],
+    "has_uncommitted": True,
+}
+
+@pytest.fixture(autouse=True)
+def stats_file(tmp_path, monkeypatch):
+    """Keep planner stats out of the real home directory."""
+    monkeypatch.setattr(planner, "STATS_FILE", tmp_path / "planner_stats.json")
+    monkeypatch.setattr(planner, "STATS_LOCK", tmp_path / "planner_stats.lock")
+    monkeypatch.setattr(planner, "_pending", {"hits": 0, "misses": 0, "rules": {}})
+    monkeypatch.delenv("GITGUARD_NO_FAST_PLAN", raising=False)
+    yield tmp_path / "planner_stats.json"
+    # Drop anything still pending so the atexit flush does not write it elsewhere
+    planner._pending = {"hits": 0, "misses": 0, "rules": {}}
+
+def _context(**overrides):
+    return {**CONTEXT, **overrides}
+
+@pytest.mark.parametrize("intent, commands", [
+    ("undo my last commit but keep my changes", ["git reset --soft HEAD~1"]),
+    ("Undo the last commit and discard my changes.", ["git reset --hard HEAD~1"]),
+    ("please push my changes", ["git push"]),
+    ("can you pull the latest changes", ["git pull"]),
+    ("fetch everything", ["git fetch --all --prune"]),
+    ("create a new branch called topic/x", ["git checkout -b topic/x"]),
+    ("switch to feature", ["git checkout feature"]),
+    ("delete branch old", ["git branch -D old"]),
+    ("delete all branches except main", ["git branch -D feature", "git branch -D old"]),
+    ("stash my changes", ["git stash push --include-untracked"]),
+    ("pop my last stash", ["git stash pop"]),
+    ("stage all changes", ["git add -A"]),
+    ("discard all my local changes", ["git reset --hard HEAD"]),
+    ("show me the status", ["git status"]),
+    ("show the commit history", ["git log --oneline -n 20"]),
+])
+def test_common_intents_are_planned_locally(intent, commands):
+    plan = match_intent(intent, _context())
+    assert plan["commands"] == commands
+    assert plan["risk"] in ("LOW", "MEDIUM", "HIGH")
+    assert plan["missing_info_prompt"] is None
+
+def test_push_without_upstream_sets_one():
+    plan = match_intent("push", _context(upstream=None, remotes=["backup", "origin"]))
+    assert plan["commands"] == ["git push -u origin main"]
+
+@pytest.mark.parametrize("intent, overrides", [
+    ("push my changes", {"remotes": []}),
+    ("push my changes", {"detached": True}),
+    ("pull", {"upstream": None}),
+    ("fetch", {"remotes": []}),
+    ("create branch feature", {}),
+    ("create branch bad..name", {}),
+    ("switch to missing", {}),
+    ("delete branch main", {}),
+    ("delete branch missing", {}),
+    ("delete all branches except feature", {}),
+    ("delete all branches except main and missing", {}),
+    ("delete all branches except main, feature and old", {}),
+    ("stash", {"has_uncommitted": False}),
+])
+def test_rules_decline_what_they_cannot_plan_safely(intent, overrides):
+    assert match_intent(intent, _context(**overrides)) is None
+
+def test_unknown_intent_needs_the_ai():
+    assert match_intent("rewrite history to remove a leaked file", _context()) is None
+
+def test_fast_planner_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("GITGUARD_NO_FAST_PLAN", "1")
+    assert match_intent("git status", _context()) is None
+
+def test_declined_match_counts_as_a_miss():
+    match_intent("stash", _context(has_uncommitted=False))
+    match_intent("stash", _context())
+    stats = planner.load_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["rules"] == {"stash": 1}
+
+def test_flush_adds_to_existing_stats(stats_file):
+    stats_file.write_text(json.dumps({"hits": 5, "misses": 2, "rules": {"push": 5}}))
+    match_intent("push", _context())
+    match_intent("nonsense", _context())
+    planner.flush_stats()
+    assert json.loads(stats_file.read_text()) == {"hits": 6, "misses": 3, "rules": {"push": 6}}
+    assert planner.load_stats()["hits"] == 6
+
+def test_concurrent_flushes_lose_no_counts(stats_file):
+    def worker():
+        for _ in range(50):
+            match_intent("status", _context())
+            planner.flush_stats()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert json.loads(stats_file.read_text())["rules"] == {"status": 200}